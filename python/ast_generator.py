@@ -1,13 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Any, List, TextIO
-from tree_parser import TreeViewNode
-
-def strip_quotes(label: str) -> str:
-    """Убираем кавычки у лексем вида '"x"'."""
-    if len(label) >= 2 and label[0] == label[-1] == '"':
-        return label[1:-1]
-    return label
+from ir import IRNode, Op
+from tree_parser import EMPTY_CHILDREN, TreeViewNode
 
 def extract_place_name_from_expr(expr_node: TreeViewNode, where: str) -> str:
     """
@@ -31,31 +26,18 @@ def extract_place_name_from_expr(expr_node: TreeViewNode, where: str) -> str:
     if not inner.children:
         raise ValueError(f'{where}: place без идентификатора')
 
-    ident_token = inner.children[0].label  # '"x"'
-    name = strip_quotes(ident_token)
-    return name
+    return inner.children[0].text  # '"x"' -> x
 
-def contains_assignment(node: TreeViewNode) -> bool:
+def contains_assignment(node: IRNode) -> bool:
     """
     Проверяет, содержит ли дерево выражений операции присваивания.
     Присваивания должны быть только на верхнем уровне (как отдельные операторы).
+    Флаг has_store собирается снизу вверх при создании узлов, поэтому
+    проверка не обходит поддерево.
     """
-    if node is None:
-        return False
-    
-    label = node.label
-    # Проверяем, является ли текущий узел операцией присваивания
-    if isinstance(label, str) and (label.startswith('store(') or label.startswith('store_at(')):
-        return True
-    
-    # Рекурсивно проверяем всех детей
-    for child in getattr(node, 'children', []) or []:
-        if contains_assignment(child):
-            return True
-    
-    return False
+    return node is not None and node.has_store
 
-def parse_expr_list(node: TreeViewNode) -> list[TreeViewNode]:
+def parse_expr_list(node: TreeViewNode) -> list[IRNode]:
     """
     list<expr>: (expr (',' expr)*)?
     В дереве могут быть только expr и запятые.
@@ -68,18 +50,15 @@ def parse_expr_list(node: TreeViewNode) -> list[TreeViewNode]:
     if not node.children:
         return []
 
-    result: list[TreeViewNode] = []
+    result: list[IRNode] = []
     for ch in node.children:
         if ch.label == 'expr':
             result.append(parse_expr(ch))
     return result
 
 
-def make_leaf(label: str) -> TreeViewNode:
-    """Создать лист нового дерева."""
-    return TreeViewNode(label=label, node=None, children=[])
 
-def parse_expr(expr: TreeViewNode) -> TreeViewNode:
+def parse_expr(expr: TreeViewNode) -> IRNode:
     """
     expr
       └── <variant>   (place / literal / binary / unary / braces / indexer / call)
@@ -105,25 +84,23 @@ def parse_expr(expr: TreeViewNode) -> TreeViewNode:
         case _:
             raise SyntaxError(f'Неизвестный вид expr: {inner.label}')
 
-def parse_place(node: TreeViewNode) -> TreeViewNode:
+def parse_place(node: TreeViewNode) -> IRNode:
     # place
     #   └── "x"
-    ident_token = node.children[0].label    # '"x"'
-    name = strip_quotes(ident_token)
-    return make_leaf(f'load({name})')
+    name = node.children[0].text    # '"x"' -> x
+    return IRNode(Op.LOAD, name=name)
 
-def parse_literal(node: TreeViewNode) -> TreeViewNode:
+def parse_literal(node: TreeViewNode) -> IRNode:
     # literal
     #   └── dec / bool / string ...
     type_node = node.children[0]           # например, 'dec'
     lit_type = type_node.label             # 'dec'
 
-    value_token = type_node.children[0].label  # '"1"', '"false"', ...
-    value = strip_quotes(value_token)
+    value = type_node.children[0].text  # '"1"', '"false"', ... без кавычек
 
-    return make_leaf(f'const({lit_type}({value}))')
+    return IRNode(Op.CONST, lit_type=lit_type, value=value)
 
-def parse_braces(node: TreeViewNode) -> TreeViewNode:
+def parse_braces(node: TreeViewNode) -> IRNode:
     # braces
     #   ├── "("
     #   ├── expr
@@ -131,13 +108,12 @@ def parse_braces(node: TreeViewNode) -> TreeViewNode:
     expr_node = node.children[1]
     return parse_expr(expr_node)
 
-def parse_unary(node: TreeViewNode) -> TreeViewNode:
+def parse_unary(node: TreeViewNode) -> IRNode:
     # unary
     #   ├── unOp
     #   │   └── "!"
     #   └── expr
-    op_token = node.children[0].children[0].label  # '"!"'
-    op = strip_quotes(op_token)                    # '!'
+    op = node.children[0].children[0].text  # '"!"' -> '!'
 
     expr_node = node.children[1]  # expr
     child_ir = parse_expr(expr_node)
@@ -146,9 +122,9 @@ def parse_unary(node: TreeViewNode) -> TreeViewNode:
     if contains_assignment(child_ir):
         raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
 
-    return TreeViewNode(label=op, node=None, children=[child_ir])
+    return IRNode(Op.UNARY, [child_ir], operator=op)
 
-def parse_binary(node: TreeViewNode) -> TreeViewNode:
+def parse_binary(node: TreeViewNode) -> IRNode:
     # binary
     #   ├── expr      (левый операнд)
     #   ├── binOp
@@ -159,8 +135,7 @@ def parse_binary(node: TreeViewNode) -> TreeViewNode:
     op_node    = node.children[1]
     right_expr = node.children[2]
 
-    op_token = op_node.children[0].label
-    op = strip_quotes(op_token)
+    op = op_node.children[0].text
 
     # Спец-случай: присваивание
     if op == ':=':
@@ -178,12 +153,8 @@ def parse_binary(node: TreeViewNode) -> TreeViewNode:
         
         # Случай 1: простая переменная (place)
         if inner.label == 'place':
-            name = strip_quotes(inner.children[0].label)
-            return TreeViewNode(
-                label=f'store({name})',
-                node=None,
-                children=[rhs_ir],
-            )
+            name = inner.children[0].text
+            return IRNode(Op.STORE, [rhs_ir], name=name)
         
         # Случай 2: индексатор (arr[idx] := val)
         if inner.label == 'indexer':
@@ -211,11 +182,7 @@ def parse_binary(node: TreeViewNode) -> TreeViewNode:
             # Создаём store_at(arr) с детьми [idx, value]
             # Для многомерных массивов - последовательно
             # store_at(arr)[idx1, idx2, ..., value]
-            return TreeViewNode(
-                label=f'store_at({base_name})',
-                node=None,
-                children=[*indices_ir, rhs_ir],
-            )
+            return IRNode(Op.STORE_AT, [*indices_ir, rhs_ir], name=base_name)
         
         raise ValueError(
             f'Левая часть присваивания: ожидается переменная или индексатор, '
@@ -223,23 +190,36 @@ def parse_binary(node: TreeViewNode) -> TreeViewNode:
         )
 
     # Обычный бинарный оператор: +, -, *, /, ...
+    # Левоассоциативная цепочка a + b + c + ... — это спуск по левым
+    # операндам. Проходим его циклом, а не рекурсией, чтобы длинные
+    # выражения не упирались в глубину стека.
+    chain = [(op, right_expr)]
+    while True:
+        inner = left_expr.children[0]
+        if inner.label != 'binary':
+            break
+        inner_op = inner.children[1].children[0].text
+        if inner_op == ':=':
+            break
+        chain.append((inner_op, inner.children[2]))
+        left_expr = inner.children[0]
+
     left_ir = parse_expr(left_expr)
-    right_ir = parse_expr(right_expr)
-    
-    # Запрещаем присваивания в операндах бинарных операций
-    if contains_assignment(left_ir):
-        raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
-    if contains_assignment(right_ir):
-        raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
+    for op, right_expr in reversed(chain):
+        right_ir = parse_expr(right_expr)
 
-    return TreeViewNode(
-        label=op,   # '+', '-', '*', ...
-        node=None,
-        children=[left_ir, right_ir],
-    )
+        # Запрещаем присваивания в операндах бинарных операций
+        if contains_assignment(left_ir):
+            raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
+        if contains_assignment(right_ir):
+            raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
 
+        left_ir = IRNode(Op.BINARY, [left_ir, right_ir], operator=op)   # '+', '-', '*', ...
 
-def parse_indexer(node: TreeViewNode) -> TreeViewNode:
+    return left_ir
+
+
+def parse_indexer(node: TreeViewNode) -> IRNode:
     # indexer
     #   ├── expr          (база: массив / вектор)
     #   ├── "["
@@ -264,21 +244,17 @@ def parse_indexer(node: TreeViewNode) -> TreeViewNode:
             raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
 
     # 3) создаём базу: load(a[])
-    acc: TreeViewNode = make_leaf(f'load({base_name}[])')
+    acc: IRNode = IRNode(Op.LOAD_ARRAY, name=base_name)
 
     # 4) последовательно навешиваем операции индексации
     for idx_ir in indices_ir:
-        acc = TreeViewNode(
-            label='index',
-            node=None,
-            children=[acc, idx_ir],
-        )
+        acc = IRNode(Op.INDEX, [acc, idx_ir])
 
     return acc
 
 
 
-def parse_call(node: TreeViewNode) -> TreeViewNode:
+def parse_call(node: TreeViewNode) -> IRNode:
     # call
     #   ├── expr          (функция)
     #   ├── "("
@@ -303,9 +279,5 @@ def parse_call(node: TreeViewNode) -> TreeViewNode:
             raise ValueError('Присваивание не может использоваться внутри выражения. Присваивания допускаются только как отдельные операторы.')
 
     # IR: call(f) с дочерними узлами-аргументами
-    return TreeViewNode(
-        label=f'call({func_name})',
-        node=None,
-        children=args_ir,
-    )
+    return IRNode(Op.CALL, args_ir or EMPTY_CHILDREN, name=func_name)
 
@@ -0,0 +1,129 @@
+"""
+Режим --batch: трансляция многих независимых программ в одном запуске.
+
+Манифест — JSON вида
+
+    {"programs": [
+        {"name": "01_main", "files": ["examples/01_main"], "out_dir": "out/01_main"},
+        ...
+    ]}
+
+(или просто список таких объектов). Относительные пути считаются от папки
+манифеста, name по умолчанию — имя out_dir. Программы транслируются в пуле
+процессов; каждый процесс один раз загружает язык и дальше переиспользует
+свой ParserSession. Формат дампов деревьев и кэш деревьев (--tree-format,
+--tree-cache) общие для всех программ. Итог по каждой программе пишется в
+<манифест>.summary.json и выводится в консоль.
+"""
+
+import contextlib
+import io
+import json
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from get_parse_tree import ParserSession
+from main import compile_program
+
+
+def load_manifest(manifest_path) -> list[dict]:
+    """Читает манифест и приводит записи к виду {"name", "files", "out_dir"}."""
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.parent
+    with manifest_path.open(encoding="utf-8") as f:
+        data = json.load(f)
+
+    programs = data["programs"] if isinstance(data, dict) else data
+    entries = []
+    for i, program in enumerate(programs):
+        if not program.get("files") or not program.get("out_dir"):
+            raise ValueError(f"{manifest_path}: у программы #{i} нет files или out_dir")
+        out_dir = base_dir / program["out_dir"]
+        entries.append({
+            "name": program.get("name") or out_dir.name,
+            "files": [str(base_dir / p) for p in program["files"]],
+            "out_dir": str(out_dir),
+        })
+    return entries
+
+
+# ParserSession процесса-воркера (создаётся в _init_batch_worker)
+_worker_session = None
+
+
+def _init_batch_worker(lib_path, lang_name, grammar_dir):
+    global _worker_session
+    _worker_session = ParserSession(lib_path, lang_name, grammar_dir)
+
+
+def compile_entry(session, entry: dict, tree_format: str = "text", tree_cache_dir=None) -> dict:
+    """
+    Транслирует одну программу манифеста. Вывод программы перехватывается
+    в поле log, исключение не прерывает пакет (статус "crash").
+    tree_format и tree_cache_dir передаются в compile_program.
+    """
+    log = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        try:
+            status = compile_program(
+                session, entry["files"], entry["out_dir"],
+                tree_format=tree_format, tree_cache_dir=tree_cache_dir,
+            )
+        except Exception:
+            status = "crash"
+            traceback.print_exc(file=log)
+    return {
+        "name": entry["name"],
+        "status": status,
+        "out_dir": entry["out_dir"],
+        "seconds": round(time.perf_counter() - started, 3),
+        "log": log.getvalue(),
+    }
+
+
+def _compile_entry_worker(entry: dict, tree_format: str, tree_cache_dir) -> dict:
+    return compile_entry(_worker_session, entry, tree_format, tree_cache_dir)
+
+
+def run_batch(
+    session, manifest_path, jobs: int = 1, tree_format: str = "text", tree_cache_dir=None
+) -> bool:
+    """
+    Транслирует все программы манифеста, пишет сводку.
+    Возвращает True, если у всех программ статус "ok".
+    tree_format — формат дампов деревьев, tree_cache_dir — директория
+    TreeCache, общая для всех программ (None — без кэша деревьев).
+    """
+    entries = load_manifest(manifest_path)
+
+    # Загружаем (или собираем) язык один раз, воркерам передаём готовую библиотеку
+    session.language
+
+    if jobs > 1 and len(entries) > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_batch_worker,
+            initargs=(session.lib_path, session.lang_name, session.grammar_dir),
+        ) as pool:
+            summary = list(pool.map(
+                _compile_entry_worker, entries, repeat(tree_format), repeat(tree_cache_dir)
+            ))
+    else:
+        summary = [
+            compile_entry(session, entry, tree_format, tree_cache_dir) for entry in entries
+        ]
+
+    for item in summary:
+        print(f"[{item['status']}] {item['name']} ({item['seconds']} с) -> {item['out_dir']}")
+
+    summary_path = Path(manifest_path).with_suffix(".summary.json")
+    with summary_path.open("w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    failed = sum(1 for item in summary if item["status"] != "ok")
+    print(f"Программ: {len(summary)}, с ошибками: {failed}. Сводка в {summary_path}")
+    return failed == 0
@@ -1,7 +1,6 @@
-def generate_alloc(out_file):
+def generate_alloc(f):
     """Генерирует код для функции alloc."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 alloc:
      ; frame layout: [bp] saved bp, [bp+4] return, [bp+8] size_shift, [bp+12] len
      ldbp 12       ; push len
@@ -14,12 +13,12 @@ alloc:
 """)
 
 
-def _generate_type_constructor(out_file, type_name, size_shift):
+def _generate_type_constructor(f, type_name, size_shift):
     """
     Общая функция для генерации конструктора типа.
     
     Args:
-        out_file: Путь к выходному файлу
+        f: Текстовый поток, в который пишется код
         type_name: Имя типа (bool, byte, int, etc.)
         size_shift: Сдвиг размера для alloc (0 для 1 байта, 1 для 2 байт, 2 для 4 байт)
     """
@@ -40,8 +39,7 @@ def _generate_type_constructor(out_file, type_name, size_shift):
     push_padding = " " * (push_col - total_push_len)
     push_line = f"{indent}{push_cmd}{push_padding}; push size_shift to stack"
     
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write(f"""
+    f.write(f"""
 {label_line}
      ldbp 8             ; load len (size of array) from [bp+8] and push to stack
 {push_line}
@@ -51,20 +49,18 @@ def _generate_type_constructor(out_file, type_name, size_shift):
 """)
 
 
-def generate_read_byte(out_file): # Вызывать с 1 аргументом для результата
+def generate_read_byte(f): # Вызывать с 1 аргументом для результата
     """Генерирует код для встроенной функции read_byte."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 read_byte:      ; Builtin function: read_byte()
     inb         ; read in byte
     stbp 8      ; store at bp + 8
     ret
 """)
 
-def generate_send_byte(out_file):
+def generate_send_byte(f):
     """Генерирует код для встроенной функции send_byte."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 send_byte:      ; Builtin function: send_byte(b: byte)
     ldbp 8      ; load bp + 8
     outb        ; send byte
@@ -72,72 +68,68 @@ send_byte:      ; Builtin function: send_byte(b: byte)
 """)
 
 
-def generate_bool_constructor(out_file):
+def generate_bool_constructor(f):
     """Генерирует код для конструктора типа bool (1 байт, size_shift=0)."""
-    _generate_type_constructor(out_file, 'bool', 0)
+    _generate_type_constructor(f, 'bool', 0)
 
 
-def generate_byte_constructor(out_file):
+def generate_byte_constructor(f):
     """Генерирует код для конструктора типа byte (1 байт, size_shift=0)."""
-    _generate_type_constructor(out_file, 'byte', 0)
+    _generate_type_constructor(f, 'byte', 0)
 
 
-def generate_int_constructor(out_file):
+def generate_int_constructor(f):
     """Генерирует код для конструктора типа int (2 байта, size_shift=1)."""
-    _generate_type_constructor(out_file, 'int', 1)
+    _generate_type_constructor(f, 'int', 1)
 
 
-def generate_uint_constructor(out_file):
+def generate_uint_constructor(f):
     """Генерирует код для конструктора типа uint (2 байта, size_shift=1)."""
-    _generate_type_constructor(out_file, 'uint', 1)
+    _generate_type_constructor(f, 'uint', 1)
 
 
-def generate_long_constructor(out_file):
+def generate_long_constructor(f):
     """Генерирует код для конструктора типа long (4 байта, size_shift=2)."""
-    _generate_type_constructor(out_file, 'long', 2)
+    _generate_type_constructor(f, 'long', 2)
 
 
-def generate_ulong_constructor(out_file):
+def generate_ulong_constructor(f):
     """Генерирует код для конструктора типа ulong (4 байта, size_shift=2)."""
-    _generate_type_constructor(out_file, 'ulong', 2)
+    _generate_type_constructor(f, 'ulong', 2)
 
 
-def generate_char_constructor(out_file):
+def generate_char_constructor(f):
     """Генерирует код для конструктора типа char (1 байт, size_shift=0)."""
-    _generate_type_constructor(out_file, 'char', 0)
+    _generate_type_constructor(f, 'char', 0)
 
 
-def generate_bool_to_byte(out_file):
+def generate_bool_to_byte(f):
     """Генерирует код для встроенной функции bool_to_byte."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 bool_to_byte:    ; Builtin function: bool_to_byte(b: bool) -> byte
     ret          ; value already at [bp+8], no conversion needed
 """)
 
 
-def generate_byte_to_bool(out_file):
+def generate_byte_to_bool(f):
     """Генерирует код для встроенной функции byte_to_bool."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 byte_to_bool:    ; Builtin function: byte_to_bool(b: byte) -> bool
     ret          ; value already at [bp+8], no conversion needed
 """)
 
 
-def generate_byte_to_int(out_file):
+def generate_byte_to_int(f):
     """Генерирует код для встроенной функции byte_to_int."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 byte_to_int:     ; Builtin function: byte_to_int(b: byte) -> int
     ret          ; value already at [bp+8], already zero-extended to 32 bits
 """)
 
 
-def generate_int_to_byte(out_file):
+def generate_int_to_byte(f):
     """Генерирует код для встроенной функции int_to_byte."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 int_to_byte:     ; Builtin function: int_to_byte(i: int) -> byte
     ldbp 8       ; load int value from [bp+8]
     push 0xFF    ; mask for byte (8 bits)
@@ -147,28 +139,25 @@ int_to_byte:     ; Builtin function: int_to_byte(i: int) -> byte
 """)
 
 
-def generate_int_to_uint(out_file):
+def generate_int_to_uint(f):
     """Генерирует код для встроенной функции int_to_uint."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 int_to_uint:     ; Builtin function: int_to_uint(i: int) -> uint
     ret          ; value already at [bp+8], no conversion needed
 """)
 
 
-def generate_uint_to_int(out_file):
+def generate_uint_to_int(f):
     """Генерирует код для встроенной функции uint_to_int."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 uint_to_int:     ; Builtin function: uint_to_int(u: uint) -> int
     ret          ; value already at [bp+8], no conversion needed
 """)
 
 
-def generate_int_to_long(out_file):
+def generate_int_to_long(f):
     """Генерирует код для встроенной функции int_to_long."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 int_to_long:     ; Builtin function: int_to_long(i: int) -> long
     ldbp 8       ; load int value from [bp+8]
     push 0xFFFF  ; mask to get only lower 16 bits
@@ -182,10 +171,9 @@ int_to_long:     ; Builtin function: int_to_long(i: int) -> long
 """)
 
 
-def generate_long_to_int(out_file):
+def generate_long_to_int(f):
     """Генерирует код для встроенной функции long_to_int."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 long_to_int:     ; Builtin function: long_to_int(l: long) -> int
     ldbp 8       ; load long value from [bp+8]
     push 0xFFFF  ; mask for int (16 bits)
@@ -195,19 +183,17 @@ long_to_int:     ; Builtin function: long_to_int(l: long) -> int
 """)
 
 
-def generate_long_to_ulong(out_file):
+def generate_long_to_ulong(f):
     """Генерирует код для встроенной функции long_to_ulong."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 long_to_ulong:   ; Builtin function: long_to_ulong(l: long) -> ulong
     ret          ; value already at [bp+8], no conversion needed
 """)
 
 
-def generate_ulong_to_long(out_file):
+def generate_ulong_to_long(f):
     """Генерирует код для встроенной функции ulong_to_long."""
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write("""
+    f.write("""
 ulong_to_long:   ; Builtin function: ulong_to_long(u: ulong) -> long
     ret          ; value already at [bp+8], no conversion needed
 """)
\ No newline at end of file
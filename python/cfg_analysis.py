@@ -0,0 +1,200 @@
+"""
+Структурный анализ CFG: обратный постпорядок, доминаторы, естественные
+циклы и глубина вложенности циклов.
+
+Результаты сохраняются в самом графе через CFG.cached и считаются заново
+только после его изменения (добавления/удаления блоков и рёбер).
+Недостижимые из входа блоки в анализе не участвуют: их нет в обратном
+постпорядке, у них нет доминатора, глубина цикла у них 0.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from graph_parser import CFG
+
+
+@dataclass
+class Dominators:
+    """
+    Дерево доминаторов.
+
+    idom     - id блока -> id непосредственного доминатора (у входа — он сам)
+    children - id блока -> блоки, которые он непосредственно доминирует
+    """
+    entry: int
+    idom: Dict[int, int]
+    children: Dict[int, List[int]]
+    # Номера входа и выхода при обходе дерева: a доминирует b, если
+    # интервал b вложен в интервал a
+    _enter: Dict[int, int] = field(default_factory=dict, repr=False)
+    _leave: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    def dominates(self, a: int, b: int) -> bool:
+        """a доминирует b (каждый блок доминирует сам себя)."""
+        if a not in self._enter or b not in self._enter:
+            return False
+        return self._enter[a] <= self._enter[b] and self._leave[b] <= self._leave[a]
+
+
+@dataclass
+class Loop:
+    """
+    Естественный цикл.
+
+    header  - заголовок цикла (условие while, начало repeat)
+    blocks  - все блоки цикла, включая заголовок
+    latches - блоки, из которых есть обратное ребро в заголовок
+    parent  - заголовок ближайшего объемлющего цикла
+    depth   - глубина вложенности (у внешнего цикла 1)
+    """
+    header: int
+    blocks: Set[int] = field(default_factory=set)
+    latches: List[int] = field(default_factory=list)
+    parent: Optional[int] = None
+    depth: int = 1
+
+
+#######################################################################
+# ANALYSES
+#######################################################################
+
+def reverse_postorder(cfg: CFG, entry_id: int = 0) -> List[int]:
+    """Блоки, достижимые из entry_id, в обратном постпорядке обхода в глубину."""
+    return cfg.cached(("rpo", entry_id), lambda g: _reverse_postorder(g, entry_id))
+
+
+def dominators(cfg: CFG, entry_id: int = 0) -> Dominators:
+    """Дерево доминаторов (алгоритм Cooper–Harvey–Kennedy)."""
+    return cfg.cached(("dominators", entry_id), lambda g: _dominators(g, entry_id))
+
+
+def natural_loops(cfg: CFG, entry_id: int = 0) -> Dict[int, Loop]:
+    """
+    Заголовок -> естественный цикл. Циклы с общим заголовком объединены;
+    словарь упорядочен от внешних циклов к внутренним.
+    """
+    return cfg.cached(("loops", entry_id), lambda g: _natural_loops(g, entry_id))
+
+
+def loop_depth(cfg: CFG, entry_id: int = 0) -> Dict[int, int]:
+    """id блока -> число циклов, в которые он входит (0 — вне циклов)."""
+    return cfg.cached(("loop_depth", entry_id), lambda g: _loop_depth(g, entry_id))
+
+
+#######################################################################
+# IMPLEMENTATION
+#######################################################################
+
+def _reverse_postorder(cfg: CFG, entry_id: int) -> List[int]:
+    if entry_id not in cfg.blocks:
+        return []
+    postorder = []
+    visited = {entry_id}
+    # Явный стек из (блок, индекс следующего ребра): глубокие графы
+    # не упираются в глубину рекурсии. Рёбра обходятся с конца, чтобы
+    # в итоговом порядке первый преемник (тело цикла, ветка then) шёл
+    # сразу за блоком, а не после всего, что идёт за циклом
+    stack = [(entry_id, 0)]
+    while stack:
+        b_id, i = stack[-1]
+        succs = cfg.blocks[b_id].succs
+        if i < len(succs):
+            stack[-1] = (b_id, i + 1)
+            succ_id = succs[-1 - i][0]
+            if succ_id not in visited:
+                visited.add(succ_id)
+                stack.append((succ_id, 0))
+        else:
+            stack.pop()
+            postorder.append(b_id)
+    postorder.reverse()
+    return postorder
+
+
+def _dominators(cfg: CFG, entry_id: int) -> Dominators:
+    rpo = reverse_postorder(cfg, entry_id)
+    index = {b_id: i for i, b_id in enumerate(rpo)}
+
+    def intersect(a: int, b: int) -> int:
+        while a != b:
+            while index[a] > index[b]:
+                a = idom[a]
+            while index[b] > index[a]:
+                b = idom[b]
+        return a
+
+    idom: Dict[int, int] = {entry_id: entry_id} if rpo else {}
+    changed = True
+    while changed:
+        changed = False
+        for b_id in rpo[1:]:
+            new_idom = None
+            for pred_id in cfg.blocks[b_id].preds:
+                if pred_id not in idom:
+                    continue
+                new_idom = pred_id if new_idom is None else intersect(pred_id, new_idom)
+            if idom.get(b_id) != new_idom:
+                idom[b_id] = new_idom
+                changed = True
+
+    children: Dict[int, List[int]] = {b_id: [] for b_id in rpo}
+    for b_id in rpo[1:]:
+        children[idom[b_id]].append(b_id)
+
+    info = Dominators(entry_id, idom, children)
+    clock = 0
+    stack = [(entry_id, False)] if rpo else []
+    while stack:
+        b_id, done = stack.pop()
+        clock += 1
+        if done:
+            info._leave[b_id] = clock
+            continue
+        info._enter[b_id] = clock
+        stack.append((b_id, True))
+        stack.extend((child, False) for child in children[b_id])
+    return info
+
+
+def _natural_loops(cfg: CFG, entry_id: int) -> Dict[int, Loop]:
+    rpo = reverse_postorder(cfg, entry_id)
+    dom = dominators(cfg, entry_id)
+
+    # Обратное ребро: latch -> header, где header доминирует latch
+    loops: Dict[int, Loop] = {}
+    for b_id in rpo:
+        for succ_id, _ in cfg.blocks[b_id].succs:
+            if dom.dominates(succ_id, b_id):
+                loop = loops.setdefault(succ_id, Loop(succ_id, {succ_id}))
+                loop.latches.append(b_id)
+
+    # Тело цикла — всё, откуда латч достижим, не проходя через заголовок
+    for loop in loops.values():
+        stack = [latch for latch in loop.latches if latch not in loop.blocks]
+        loop.blocks.update(stack)
+        while stack:
+            b_id = stack.pop()
+            for pred_id in cfg.blocks[b_id].preds:
+                if pred_id not in loop.blocks and pred_id in dom.idom:
+                    loop.blocks.add(pred_id)
+                    stack.append(pred_id)
+
+    # Внешние циклы больше внутренних: родитель — наименьший из циклов,
+    # содержащих заголовок
+    ordered = sorted(loops.values(), key=lambda loop: -len(loop.blocks))
+    for i, loop in enumerate(ordered):
+        for outer in reversed(ordered[:i]):
+            if loop.header in outer.blocks:
+                loop.parent = outer.header
+                loop.depth = outer.depth + 1
+                break
+    return {loop.header: loop for loop in ordered}
+
+
+def _loop_depth(cfg: CFG, entry_id: int) -> Dict[int, int]:
+    depth = {b_id: 0 for b_id in cfg.blocks}
+    for loop in natural_loops(cfg, entry_id).values():
+        for b_id in loop.blocks:
+            depth[b_id] = max(depth[b_id], loop.depth)
+    return depth
@@ -0,0 +1,59 @@
+"""
+Общие фикстуры тестов.
+
+Модули проекта импортируются как верхнеуровневые (import graph_parser).
+Из-за python/__init__.py pytest при запуске из корня репозитория
+(python -m pytest python) кладёт в sys.path корень, а не эту папку,
+поэтому она добавляется здесь явно. Из python/ тесты запускаются просто
+python -m pytest.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from get_parse_tree import ParserSession, shared_lib_suffix  # noqa: E402
+
+GRAMMAR_DIR = os.path.join(os.path.dirname(HERE), "tree-sitter")
+EXAMPLES_DIR = os.path.join(os.path.dirname(HERE), "examples")
+
+
+@pytest.fixture(scope="session")
+def var2_lib(tmp_path_factory) -> str:
+    """
+    Библиотека языка var2, собранная компилятором C прямо из
+    tree-sitter/src/parser.c (tree-sitter CLI для этого не нужен).
+    """
+    cc = shutil.which(os.environ.get("CC", "cc"))
+    if cc is None:
+        pytest.skip("нет компилятора C для сборки грамматики")
+    src_dir = os.path.join(GRAMMAR_DIR, "src")
+    sources = [
+        os.path.join(src_dir, name)
+        for name in ("parser.c", "scanner.c")
+        if os.path.exists(os.path.join(src_dir, name))
+    ]
+    out_path = tmp_path_factory.mktemp("grammar") / f"var2{shared_lib_suffix()}"
+    subprocess.run(
+        [cc, "-shared", "-fPIC", "-O0", "-I", src_dir, *sources, "-o", str(out_path)],
+        check=True,
+    )
+    return str(out_path)
+
+
+@pytest.fixture
+def session(var2_lib) -> ParserSession:
+    return ParserSession(var2_lib, "var2")
+
+
+@pytest.fixture
+def example_path():
+    """Путь к программе из examples/ по имени (например, "06_while")."""
+    return lambda name: os.path.join(EXAMPLES_DIR, name)
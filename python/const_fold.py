@@ -0,0 +1,192 @@
+"""
+Свёртка констант в типизированном IR перед генерацией кода.
+
+Подвыражения, у которых все листья — литералы (dec, hex, bits, char, bool),
+вычисляются при трансляции и заменяются одним const(dec(...)). Вычисление
+повторяет то, что сделал бы целевой код: операнды — 32-битные слова,
+операции — как у команд stack16, после арифметических и битовых операций
+результат проходит ту же маску и расширение знака, что и apply_type_mask.
+Поэтому на стек попадает то же значение, только одной командой push.
+
+Деление и остаток сворачиваются только при ненулевом делителе и
+неотрицательных (как знаковые 32-битные) операндах: там знаковый и
+беззнаковый результат совпадают.
+"""
+
+from generate_asm import UNSIGNED_TYPES, get_type_mask
+from ir import IRNode, Op
+
+WORD = 0xFFFFFFFF
+SIGN_BIT = 0x80000000
+
+# Операции, после которых генератор применяет маску типа
+MASKED_BINARY_OPS = {'+', '-', '*', '/', '%', '<<', '>>', '|', '&', '^'}
+MASKED_UNARY_OPS = {'~'}
+
+
+def literal_word(lit_type: str, value: str) -> int | None:
+    """Слово, которое push кладёт на стек для литерала; None — не сворачиваем."""
+    match lit_type:
+        case 'bool':
+            return 0 if value.lower() == 'false' else 1
+        case 'char':
+            return ord(value[1]) & WORD
+        case 'hex':
+            return int(value[2:], 16) & WORD
+        case 'bits':
+            return int(value[2:], 2) & WORD
+        case 'dec':
+            return int(value) & WORD
+    return None
+
+
+def wrap_to_type(word: int, type_str: str | None) -> int:
+    """Маска и расширение знака как в apply_type_mask."""
+    mask = get_type_mask(type_str)
+    if mask is None:
+        return word
+    word &= mask
+    if type_str.strip().lower() == 'int':
+        word = ((word ^ 0x8000) - 0x8000) & WORD
+    return word
+
+
+def _signed(word: int) -> int:
+    return word - (1 << 32) if word & SIGN_BIT else word
+
+
+def _shift(value: int, count: int, left: bool) -> int:
+    # shl/shr: отрицательный сдвиг — сдвиг в другую сторону, счётчик по модулю 32
+    if count & SIGN_BIT:
+        count = (-count) & 0x1F
+        left = not left
+    else:
+        count &= 0x1F
+    return (value << count) & WORD if left else value >> count
+
+
+def eval_binary(op: str, a: int, b: int, operand_type: str | None) -> int | None:
+    """Результат бинарной команды над словами a и b (без маски типа)."""
+    match op:
+        case '+':
+            return (a + b) & WORD
+        case '-':
+            return (a - b) & WORD
+        case '*':
+            return (a * b) & WORD
+        case '/' | '%':
+            if b == 0 or (a | b) & SIGN_BIT:
+                return None
+            return a // b if op == '/' else a % b
+        case '<<':
+            return _shift(a, b, left=True)
+        case '>>':
+            return _shift(a, b, left=False)
+        case '|':
+            return a | b
+        case '&':
+            return a & b
+        case '^':
+            return a ^ b
+        case '||':
+            return int((a | b) != 0)
+        case '&&':
+            return int((a & b) != 0)
+        case '=':
+            return int(a == b)
+        case '!=':
+            return int(a != b)
+
+    # Сравнения: знаковые или беззнаковые по типу левого операнда, как в process_bin_op
+    if operand_type is None or operand_type.strip().lower() not in UNSIGNED_TYPES:
+        a, b = _signed(a), _signed(b)
+    match op:
+        case '>':
+            return int(a > b)
+        case '<':
+            return int(a < b)
+        case '>=':
+            return int(a >= b)
+        case '<=':
+            return int(a <= b)
+    return None
+
+
+def eval_unary(op: str, a: int) -> int | None:
+    match op:
+        case '!':
+            return int(a == 0)
+        case '~':
+            return ~a & WORD
+    return None
+
+
+def _const_word(node: IRNode) -> int | None:
+    if node.op is Op.CONST:
+        return literal_word(node.lit_type, node.value)
+    return None
+
+
+def _folded(node: IRNode, word: int) -> IRNode:
+    folded = IRNode(Op.CONST, lit_type='dec', value=str(word))
+    folded.type = node.type
+    return folded
+
+
+def fold_constants(node: IRNode | None) -> IRNode | None:
+    """
+    Возвращает дерево со свёрнутыми константными подвыражениями.
+    Исходное дерево не меняется: узлы, в которых ничего не свернулось,
+    переиспользуются, изменившиеся создаются заново.
+    """
+    if node is None:
+        return None
+
+    # Обход в обратном порядке на явном стеке: длинные цепочки операций
+    # не упираются в глубину рекурсии
+    folded: dict[int, IRNode] = {}
+    stack = [(node, False)]
+    while stack:
+        current, ready = stack.pop()
+        if not ready:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+            continue
+        children = [folded.pop(id(child)) for child in current.children]
+        folded[id(current)] = _fold_node(current, children)
+    return folded[id(node)]
+
+
+def _fold_node(node: IRNode, children: list[IRNode]) -> IRNode:
+    """Сворачивает узел, дети которого уже свёрнуты."""
+    if not children:
+        return node
+
+    if node.op is Op.BINARY:
+        a, b = _const_word(children[0]), _const_word(children[1])
+        if a is not None and b is not None:
+            word = eval_binary(node.operator, a, b, children[0].type)
+            if word is not None:
+                if node.operator in MASKED_BINARY_OPS:
+                    word = wrap_to_type(word, node.type)
+                return _folded(node, word)
+
+    elif node.op is Op.UNARY:
+        a = _const_word(children[0])
+        if a is not None:
+            word = eval_unary(node.operator, a)
+            if word is not None:
+                if node.operator in MASKED_UNARY_OPS:
+                    word = wrap_to_type(word, node.type)
+                return _folded(node, word)
+
+    if all(new is old for new, old in zip(children, node.children)):
+        return node
+
+    copy = IRNode(
+        node.op, children,
+        name=node.name, operator=node.operator,
+        lit_type=node.lit_type, value=node.value,
+    )
+    copy.type = node.type
+    return copy
@@ -0,0 +1,366 @@
+"""
+Битовый анализ потока данных над блоками CFG.
+
+Множества хранятся в int: бит i — i-я переменная, определение или
+выражение. Объединение, пересечение и разность — одна операция над
+числом, поэтому проход по блоку не зависит от размера множества.
+
+solve — общий решатель для задач вида  out = gen | (in & ~kill)
+по списку работ, упорядоченному по обратному постпорядку (для прямых
+задач) или по обратному ему (для обратных). На нём построены:
+
+  liveness             — живые переменные (обратная, объединение)
+  reaching_definitions — достигающие определения (прямая, объединение)
+  available_expressions — доступные выражения (прямая, пересечение)
+
+Переменные берутся из списков параметров и локальных переменных функции
+(get_args_list_ordered / get_vars_list_ordered). Чтение — load(x),
+load(a[]) и store_at(a) (элемент пишется через ссылку на массив),
+запись — store(x). Имена, которых нет в списках, не учитываются.
+"""
+
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from cfg_analysis import reverse_postorder
+from graph_parser import CFG
+from ir import IRNode, Op
+
+
+@dataclass
+class BitIndex:
+    """
+    Нумерация элементов множества: ключ -> номер бита -> элемент.
+    Ключ — то, по чему элементы считаются одинаковыми (по умолчанию сам
+    элемент); у выражений это их структура, а элемент — первый узел IR.
+    """
+    items: List[object] = field(default_factory=list)
+    bits: Dict[object, int] = field(default_factory=dict)
+
+    def add(self, item, key=None) -> int:
+        if key is None:
+            key = item
+        bit = self.bits.get(key)
+        if bit is None:
+            bit = self.bits[key] = len(self.items)
+            self.items.append(item)
+        return bit
+
+    def mask(self, keys: Iterable) -> int:
+        """Битовое множество по ключам (неизвестные пропускаются)."""
+        result = 0
+        for key in keys:
+            bit = self.bits.get(key)
+            if bit is not None:
+                result |= 1 << bit
+        return result
+
+    def decode(self, bits: int) -> List[object]:
+        """Элементы битового множества в порядке номеров."""
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(self.items[low.bit_length() - 1])
+            bits ^= low
+        return result
+
+    @property
+    def universe(self) -> int:
+        return (1 << len(self.items)) - 1
+
+
+def variable_index(params, vars) -> BitIndex:
+    """Нумерация переменных функции: сначала параметры, затем локальные."""
+    index = BitIndex()
+    for name, _type in list(params) + list(vars):
+        index.add(name)
+    return index
+
+
+@dataclass
+class DataflowResult:
+    """
+    Решение задачи. ins/outs — множества на входе и выходе блока
+    в порядке выполнения (для обратной задачи тоже), index — нумерация
+    их элементов.
+    """
+    ins: Dict[int, int]
+    outs: Dict[int, int]
+    index: Optional[BitIndex] = None
+
+    def items_in(self, b_id: int) -> List[object]:
+        return self.index.decode(self.ins[b_id])
+
+    def items_out(self, b_id: int) -> List[object]:
+        return self.index.decode(self.outs[b_id])
+
+
+#######################################################################
+# SOLVER
+#######################################################################
+
+def solve(
+    cfg: CFG,
+    gen: Dict[int, int],
+    kill: Dict[int, int],
+    *,
+    forward: bool = True,
+    union: bool = True,
+    boundary: int = 0,
+    universe: int = 0,
+    entry_id: int = 0,
+) -> DataflowResult:
+    """
+    Решает задачу  out = gen | (in & ~kill)  по списку работ.
+
+    forward  — прямая задача (in — слияние выходов предшественников) или
+               обратная (out — слияние входов преемников, in считается из out)
+    union    — слияние объединением (иначе пересечением; тогда universe —
+               множество всех элементов, им инициализируются блоки)
+    boundary — значение на входе entry_id (прямая) или на выходе блоков,
+               из которых можно выйти из функции (обратная, Block.exits)
+    """
+    # Список из кэша CFG не меняем
+    order = list(reverse_postorder(cfg, entry_id))
+    seen = set(order)
+    order += [b_id for b_id in cfg.blocks if b_id not in seen]
+    if not forward:
+        order.reverse()
+
+    blocks = cfg.blocks
+    init = 0 if union else universe
+    # before/after — со стороны, откуда приходит информация, и куда уходит
+    before = dict.fromkeys(order, init)
+    after = dict.fromkeys(order, init)
+
+    # Список работ — куча номеров в порядке обхода: блок, чей вход
+    # изменился, пересчитывается раньше всех, кто стоит после него, поэтому
+    # цикл сходится целиком до того, как решение уйдёт дальше по графу
+    position = {b_id: i for i, b_id in enumerate(order)}
+    worklist = list(range(len(order)))
+    queued = set(order)
+    while worklist:
+        b_id = order[heappop(worklist)]
+        queued.discard(b_id)
+        block = blocks[b_id]
+
+        if forward:
+            sources = block.preds
+            at_boundary = b_id == entry_id
+        else:
+            sources = [succ_id for succ_id, _ in block.succs]
+            at_boundary = block.exits
+        if union:
+            value = boundary if at_boundary else 0
+            for src in sources:
+                value |= after[src]
+        else:
+            value = boundary if at_boundary else universe
+            for src in sources:
+                value &= after[src]
+        before[b_id] = value
+
+        value = gen.get(b_id, 0) | (value & ~kill.get(b_id, 0))
+        # Все блоки уже стоят в очереди, поэтому неизменившийся выход
+        # соседям пересылать не нужно
+        if value == after[b_id]:
+            continue
+        after[b_id] = value
+        targets = [succ_id for succ_id, _ in block.succs] if forward else block.preds
+        for target in targets:
+            if target not in queued:
+                queued.add(target)
+                heappush(worklist, position[target])
+
+    if forward:
+        return DataflowResult(before, after)
+    return DataflowResult(after, before)
+
+
+#######################################################################
+# ANALYSES
+#######################################################################
+
+def execution_order(tree: IRNode) -> List[IRNode]:
+    """Узлы дерева в порядке вычисления: дети слева направо, затем узел."""
+    # Это обход «узел, затем дети справа налево», прочитанный с конца
+    order = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children)
+    order.reverse()
+    return order
+
+
+def read_names(tree: IRNode) -> Iterator[str]:
+    """Имена переменных, которые читает дерево (с повторами)."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        op = node.op
+        if op is Op.LOAD or op is Op.LOAD_ARRAY or op is Op.STORE_AT:
+            yield node.name
+        stack.extend(node.children)
+
+
+def liveness(cfg: CFG, params, vars, exit_live: Iterable[str] = ()) -> DataflowResult:
+    """
+    Живые переменные: переменная жива, если её текущее значение ещё
+    может быть прочитано. exit_live — живые при выходе из функции
+    (например, переменная с возвращаемым значением).
+    """
+    index = variable_index(params, vars)
+    gen: Dict[int, int] = {}
+    kill: Dict[int, int] = {}
+    for b_id, block in cfg.blocks.items():
+        used = defined = 0
+        for tree in block.trees:
+            # Присваивание бывает только корнем оператора (вложенные
+            # ast_generator запрещает), поэтому все чтения дерева идут до него
+            used |= index.mask(read_names(tree)) & ~defined
+            if tree.op is Op.STORE:
+                defined |= index.mask((tree.name,))
+        gen[b_id] = used
+        kill[b_id] = defined
+
+    result = solve(cfg, gen, kill, forward=False, boundary=index.mask(exit_live))
+    result.index = index
+    return result
+
+
+def reaching_definitions(cfg: CFG, params, vars) -> DataflowResult:
+    """
+    Достигающие определения. Элементы — узлы store(x) и, для каждой
+    переменной, её начальное значение (имя переменной: аргумент или
+    обнуление при входе в функцию).
+    """
+    variables = variable_index(params, vars)
+    index = BitIndex()
+    for name in variables.items:
+        index.add(name)
+    # Маска всех определений каждой переменной
+    defs_of = [1 << bit for bit in range(len(variables.items))]
+
+    stores: Dict[int, List[IRNode]] = {}
+    for b_id, block in cfg.blocks.items():
+        stores[b_id] = [
+            tree
+            for tree in block.trees
+            if tree.op is Op.STORE and tree.name in variables.bits
+        ]
+        for node in stores[b_id]:
+            defs_of[variables.bits[node.name]] |= 1 << index.add(node)
+
+    gen: Dict[int, int] = {}
+    kill: Dict[int, int] = {}
+    for b_id, block_stores in stores.items():
+        generated = killed = 0
+        for node in block_stores:
+            same_var = defs_of[variables.bits[node.name]]
+            generated = (generated & ~same_var) | (1 << index.bits[node])
+            killed |= same_var
+        gen[b_id] = generated
+        kill[b_id] = killed
+
+    result = solve(cfg, gen, kill, boundary=index.mask(variables.items))
+    result.index = index
+    return result
+
+
+_IMPURE = (None, 0, False)
+_CLOBBER = ("clobber",)
+
+
+def available_expressions(cfg: CFG, params, vars) -> DataflowResult:
+    """
+    Доступные выражения: вычисленные на каждом пути к блоку и с тех пор
+    не испорченные. Выражения — узлы binary/unary/index без вызовов и
+    присваиваний внутри; одинаковые по структуре считаются одним.
+    Выражение портит store любой его переменной; если оно читает
+    элементы массива — ещё и любой store_at и вызов функции (массивы
+    передаются по ссылке).
+    """
+    variables = variable_index(params, vars)
+    index = BitIndex()
+    uses_var = [0] * len(variables.items)
+    reads_memory = 0
+
+    # Ключ узла — номер его структуры: (метка узла, ключи детей);
+    # None — в поддереве есть вызов или присваивание
+    keys: Dict[tuple, int] = {}
+    # События блока по порядку: ("gen", бит), ("store", бит переменной), ("clobber",)
+    events: Dict[int, List[tuple]] = {}
+    for b_id, block in cfg.blocks.items():
+        block_events = events[b_id] = []
+        for tree in block.trees:
+            # Узлы идут в порядке вычисления, поэтому значения детей —
+            # (ключ, маска переменных, читает ли память) — лежат на вершине стека
+            values: List[tuple] = []
+            for node in execution_order(tree):
+                op = node.op
+                count = len(node.children)
+                if count:
+                    children = values[-count:]
+                    del values[-count:]
+                else:
+                    children = ()
+
+                impure = op is Op.CALL or op is Op.STORE or op is Op.STORE_AT
+                var_mask = 0
+                memory = op is Op.INDEX
+                for child_key, child_vars, child_memory in children:
+                    if child_key is None:
+                        impure = True
+                        break
+                    var_mask |= child_vars
+                    memory = memory or child_memory
+                if impure:
+                    values.append(_IMPURE)
+                    if op is Op.STORE:
+                        bit = variables.bits.get(node.name)
+                        if bit is not None:
+                            block_events.append(("store", bit))
+                    elif op is Op.CALL or op is Op.STORE_AT:
+                        block_events.append(_CLOBBER)
+                    continue
+
+                if op is Op.LOAD or op is Op.LOAD_ARRAY:
+                    bit = variables.bits.get(node.name)
+                    if bit is not None:
+                        var_mask |= 1 << bit
+                # Метка узла однозначно задаёт операцию и её атрибуты
+                structure = (node.label, *(child[0] for child in children))
+                key = keys.setdefault(structure, len(keys))
+                values.append((key, var_mask, memory))
+
+                if op is Op.BINARY or op is Op.UNARY or op is Op.INDEX:
+                    known = key in index.bits
+                    bit = index.add(node, key)
+                    if not known:
+                        if memory:
+                            reads_memory |= 1 << bit
+                        for var_bit in range(var_mask.bit_length()):
+                            if var_mask >> var_bit & 1:
+                                uses_var[var_bit] |= 1 << bit
+                    block_events.append(("gen", bit))
+
+    gen: Dict[int, int] = {}
+    kill: Dict[int, int] = {}
+    for b_id, block_events in events.items():
+        available = killed = 0
+        for event in block_events:
+            if event[0] == "gen":
+                available |= 1 << event[1]
+                continue
+            spoiled = uses_var[event[1]] if event[0] == "store" else reads_memory
+            available &= ~spoiled
+            killed |= spoiled
+        gen[b_id] = available
+        kill[b_id] = killed
+
+    result = solve(cfg, gen, kill, union=False, universe=index.universe)
+    result.index = index
+    return result
@@ -1,12 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
 
-from get_parse_tree import get_tree_root
-from tree_parser import write_tree_view_to_file, build_tree_view
-from graph_parser import build_graph, render_cfg, get_func_name
+from get_parse_tree import ParserSession, open_source
+from tree_parser import TREE_DUMP_FORMATS, build_tree_view, collect_syntax_errors, detach_parser_nodes, dump_tree_view
+from graph_parser import build_graph, render_cfg, get_func_name, has_body
 from graphviz import Digraph  
 from tree_parser import TreeViewNode
+from tree_cache import TreeCache
 
 import argparse
+import os
 
 
 def parse_cli():
@@ -14,21 +18,32 @@ def parse_cli():
     Запуск с уже собранной библиотекой:
     python main.py path/to/parser.dll input1.txt [input2.txt ...] output_dir [--lib lang_name]
 
-    - Первый аргумент: путь к .dll/.so/.dylib
+    Запуск с установленным пакетом tree_sitter_<lang_name> (без библиотеки):
+    python main.py --binding lang_name input1.txt [input2.txt ...] output_dir
+
+    - Первый аргумент: путь к .dll/.so/.dylib (с --binding не указывается)
     - Далее: один или несколько входных файлов
     - Последний аргумент: выходная директория
     - --lib: название парсера (опционально). Если не указано, берется из имени файла библиотеки.
+    - --watch [--interval SEC]: режим наблюдения за файлами (см. watch.py).
+    - --jobs N: параллельная обработка входных файлов (с --batch — программ).
+    - --batch MANIFEST: пакетная трансляция; файлы и out_dir не указываются.
+    - --tree-format text|gzip|binary: формат дампов деревьев в out_dir/tree.
+    - --tree-cache DIR: кэш деревьев неизменённых файлов (см. tree_cache.py).
+    Последний элемент кортежа — прочие опции (watch, interval, jobs, batch,
+    tree_format, tree_cache).
     """
     p = argparse.ArgumentParser(description="Запуск tree-sitter парсера")
 
     p.add_argument(
         "lib_path",
+        nargs="?",
         help="Путь к скомпилированной tree-sitter библиотеке (.so/.dll/.dylib)"
     )
     
     p.add_argument(
         "rest",
-        nargs="+",
+        nargs="*",
         help="Входные файлы и выходная директория: file1 [file2 ...] out_dir"
     )
     
@@ -38,10 +53,72 @@ def parse_cli():
         help="Название парсера (например, 'foo' для tree_sitter_foo). Если не указано, берется из имени файла библиотеки."
     )
 
+    p.add_argument(
+        "--binding",
+        metavar="LANG",
+        help="Взять язык из установленного пакета tree_sitter_LANG; путь к библиотеке не указывается."
+    )
+
+    p.add_argument(
+        "--watch",
+        action="store_true",
+        help="Не завершаться: следить за входными файлами и пересобирать только изменившиеся функции."
+    )
+
+    p.add_argument(
+        "--interval",
+        type=float,
+        default=0.5,
+        help="Период опроса файлов в режиме --watch, секунды (по умолчанию 0.5)."
+    )
+
+    p.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="JSON-манифест программ (наборы файлов и выходные директории) для пакетной трансляции (см. batch.py)."
+    )
+
+    p.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Число процессов для параллельной обработки входных файлов (0 — по числу ядер)."
+    )
+
+    p.add_argument(
+        "--tree-format",
+        choices=sorted(TREE_DUMP_FORMATS),
+        default="text",
+        help="Формат дампов деревьев в out_dir/tree: text (по умолчанию), gzip или binary."
+    )
+
+    p.add_argument(
+        "--tree-cache",
+        metavar="DIR",
+        help="Директория кэша деревьев: неизменённые файлы не разбираются заново."
+    )
+
     a = p.parse_args()
 
+    if a.binding is not None:
+        if a.lang_name_override:
+            p.error("С --binding имя языка задаётся самим --binding, --lib не нужен.")
+        # Библиотеки нет, поэтому первый позиционный аргумент — уже входной файл
+        if a.lib_path is not None:
+            a.rest.insert(0, a.lib_path)
+            a.lib_path = None
+    elif a.lib_path is None:
+        p.error("Необходимо указать путь к библиотеке или --binding LANG.")
+
+    if a.batch is not None and a.rest:
+        p.error("С --batch входные файлы и выходная директория берутся из манифеста.")
+    if a.batch is not None and a.watch:
+        p.error("Нельзя одновременно указывать --batch и --watch.")
+    if a.watch and a.jobs != 1:
+        p.error("--watch пересобирает изменившиеся функции в одном процессе, --jobs с ним не используется.")
+
     # Проверка минимального количества аргументов
-    if len(a.rest) < 2:
+    if a.batch is None and len(a.rest) < 2:
         p.error(
             "Необходимо указать хотя бы один входной файл и выходную директорию.\n"
             "Пример: python main.py path/to/lib.dll input1.c [input2.c ...] out_dir"
@@ -49,10 +126,12 @@ def parse_cli():
 
     lib_path = a.lib_path
     file_paths = a.rest[:-1]
-    out_dir = a.rest[-1]
+    out_dir = a.rest[-1] if a.rest else None
 
-    # Извлекаем имя языка: либо из флага --lib, либо из имени файла библиотеки
-    if a.lang_name_override:
+    # Извлекаем имя языка: из --binding, из флага --lib или из имени файла библиотеки
+    if a.binding is not None:
+        lang_name = a.binding
+    elif a.lang_name_override:
         lang_name = a.lang_name_override
     else:
         stem = Path(lib_path).stem  # e.g. libfoo -> libfoo, foo -> foo
@@ -61,7 +140,14 @@ def parse_cli():
     # Для совместимости с остальным кодом
     grammar_dir = None
 
-    return grammar_dir, lang_name, file_paths, out_dir, lib_path
+    if a.jobs <= 0:
+        a.jobs = os.cpu_count() or 1
+    options = argparse.Namespace(
+        watch=a.watch, interval=a.interval, jobs=a.jobs, batch=a.batch,
+        tree_format=a.tree_format, tree_cache=a.tree_cache,
+    )
+
+    return grammar_dir, lang_name, file_paths, out_dir, lib_path, options
 
 
 BUILTIN_TYPES = {
@@ -130,7 +216,7 @@ def get_args_list_ordered(tree):
         if not ident_node:
             continue
         
-        name = ident_node.children[0].label.strip('"')
+        name = ident_node.children[0].text
         type_str = None
         
         if type_ref_node:
@@ -188,7 +274,7 @@ def get_vars_list_ordered(tree):
         
         # собираем имена идентификаторов a,b,c,...
         names = [
-            ident.children[0].label.strip('"')
+            ident.children[0].text
             for ident in node.children
             if ident.label == 'identifier'
         ]
@@ -252,142 +338,339 @@ def compare_treeviews(previous_subtree: TreeViewNode | None,
     return True
 
 
-def analyze_files(file_paths, lib_path, lang_name, grammar_dir, out_dir=None):
+def build_function(node, func_name, file_path):
     """
-    Обработка набора файлов.
+    Строит CFG одной функции верхнего уровня, не заглядывая в другие файлы.
+
+    Возвращает словарь {"cfg", "calls", "errors", "params", "vars"}.
+    cfg == None — у функции нет тела или граф не построился (причина в errors).
     """
-    results_internal = {}  # func_name -> {"calls": set(), "errors": [], "cfg": None, "tree": None}
-    global_func_names = set()  # множество всех имён функций (для проверки дубликатов)
+    built = {"cfg": None, "calls": set(), "errors": [], "params": [], "vars": []}
+
+    try:
+        cfg, call_names, errors_graph = build_graph(node)
+    except SyntaxError as e:
+        built["errors"].append(
+            f"SyntaxError while building graph for '{func_name}' "
+            f"in file '{file_path}': {e}"
+        )
+        return built
 
-    tree_dir = graph_dir = None
-    if out_dir is not None:
-        out_dir = Path(out_dir)
-        tree_dir = out_dir / "tree"
-        graph_dir = out_dir / "graph"
-        tree_dir.mkdir(parents=True, exist_ok=True)
-        graph_dir.mkdir(parents=True, exist_ok=True)
+    if cfg is None:
+        return built
 
-    for file_path in file_paths:
-        file_path = str(file_path)
-        input_file_name = Path(file_path).stem
+    for err in errors_graph:
+        built["errors"].append(f"{file_path}: {err}")
 
-        root = get_tree_root(lib_path, lang_name, file_path, grammar_dir)
-        view_root, errors_tree_build = build_tree_view(root)
+    for name in call_names:
+        clean_name = name.strip().strip('"')
+        if clean_name:
+            built["calls"].add(clean_name)
 
-        # Ошибки построения дерева
-        if errors_tree_build:
-            pseudo_name = f"<file:{input_file_name}>"
-            data = results_internal.setdefault(
-                pseudo_name, {"calls": set(), "errors": [], "cfg": None, "tree": view_root, "params": [], "vars": []}
-            )
-            for msg in errors_tree_build:
-                data["errors"].append(f"{file_path}: {msg}")
-            continue
+    cfg.remove_dangling_blocks()
+    cfg.coalesce_blocks()
+    built["cfg"] = cfg
+
+    # Извлекаем параметры функции в упорядоченном виде
+    built["params"] = get_args_list_ordered(node)
+    # Извлекаем локальные переменные функции в упорядоченном виде
+    built["vars"] = get_vars_list_ordered(node)
+    return built
+
+
+def resolve_declarations(declared, view_root):
+    """
+    Проверка повторных объявлений / перегрузки по одним деревьям,
+    без построения CFG.
 
-        if tree_dir is not None:
-            write_tree_view_to_file(view_root, str(tree_dir / input_file_name))
+    declared — общий для всех файлов словарь func_name -> дерево последнего
+    принятого объявления, пока у всех объявлений этого имени нет тела
+    (тогда следующее объявление с той же сигнатурой можно принять),
+    или None, если реализация уже есть или была ошибка.
 
-        # Обходим функции верхнего уровня
-        for node in getattr(view_root, "children", []):
-            func_name = get_func_name(node).strip().strip('"')
-            if not func_name:
+    Выдаёт (func_name, node, accepted) по порядку функций файла.
+    """
+    for node in getattr(view_root, "children", []):
+        func_name = get_func_name(node).strip().strip('"')
+        if not func_name:
+            continue
+
+        if func_name in declared:
+            previous_tree = declared[func_name]
+            # Уже есть реализация или были ошибки — это точно перегрузка.
+            # Иначе функция существует логически, но пока "not defined":
+            # новую реализацию принимаем, если сигнатура совпадает с сигнатурой
+            # предыдущего объявления
+            if previous_tree is None or not compare_treeviews(
+                previous_tree.children[0].children[1], node.children[0].children[1]
+            ):
+                declared[func_name] = None
+                yield func_name, node, False
                 continue
 
-            data = results_internal.setdefault(
-                func_name, {"calls": set(), "errors": [], "cfg": None, "tree": node, "params": [], "vars": []}
+        # Функция с телом строится в CFG (или даёт ошибку) — дальше имя закрыто
+        declared[func_name] = None if has_body(node) else node
+        yield func_name, node, True
+
+
+def merge_file_functions(results_internal, declared, file_path,
+                         view_root, errors_tree_build, build=None, graph_dir=None):
+    """
+    Добавляет функции одного файла в общую таблицу results_internal
+    с проверкой повторных объявлений / перегрузки (resolve_declarations;
+    declared — её словарь, общий для всех файлов).
+
+    build(func_name, node) -> словарь build_function; по умолчанию
+    функция строится тут же. Вызывается только для принятых объявлений.
+    """
+    if build is None:
+        def build(func_name, node):
+            return build_function(node, func_name, file_path)
+
+    input_file_name = Path(file_path).stem
+
+    # Ошибки построения дерева
+    if errors_tree_build:
+        pseudo_name = f"<file:{input_file_name}>"
+        data = results_internal.setdefault(
+            pseudo_name, {"calls": set(), "errors": [], "cfg": None, "tree": view_root, "params": [], "vars": []}
+        )
+        for msg in errors_tree_build:
+            data["errors"].append(f"{file_path}: {msg}")
+        return
+
+    data = None
+
+    # Обходим функции верхнего уровня
+    for func_name, node, accepted in resolve_declarations(declared, view_root):
+        data = results_internal.setdefault(
+            func_name, {"calls": set(), "errors": [], "cfg": None, "tree": node, "params": [], "vars": []}
+        )
+
+        if not accepted:
+            data["errors"].append(
+                f"Ошибка: попытка перегрузки функции '{func_name}' в файле '{file_path}'"
             )
+            continue
 
-            # ВАЖНО: сохраняем старое дерево ДО любых изменений
-            previous_tree = data["tree"]
-            current_tree = node
-
-            # Проверка повторных объявлений / перегрузки
-            if func_name in global_func_names:
-                # Функция уже встречалась ранее
-                if data["cfg"] is None and not data["errors"]:
-                    # Функция существует логически, но пока "not defined"
-                    # (нет CFG и нет ошибок) — можно попытаться принять
-                    # новую реализацию при выполнении условия.
-
-                    # previous_tree — дерево предыдущего объявления
-                    # current_tree  — дерево текущего объявления
-                    previous_subtree = previous_tree.children[0].children[1]
-                    current_subtree = current_tree.children[0].children[1]
-
-                    if not compare_treeviews(previous_subtree, current_subtree):
-                        data["errors"].append(
-                            f"Ошибка: попытка перегрузки функции '{func_name}' в файле '{file_path}'"
-                        )
-                        continue
-
-                    # Условие прошло — принимаем новую реализацию:
-                    data["tree"] = current_tree
-                else:
-                    # Уже есть реализация (cfg != None) или были ошибки —
-                    # это точно перегрузка
-                    data["errors"].append(
-                        f"Ошибка: попытка перегрузки функции '{func_name}' в файле '{file_path}'"
-                    )
-                    continue
-            else:
-                # Первое появление имени функции
-                global_func_names.add(func_name)
-                data["tree"] = current_tree
-
-            # Построение графа
-            try:
-                cfg, call_names, errors_graph = build_graph(node)
-            except SyntaxError as e:
-                data["errors"].append(
-                    f"SyntaxError while building graph for '{func_name}' "
-                    f"in file '{file_path}': {e}"
-                )
-                continue
+        data["tree"] = node
 
-            if cfg is None:
-                continue
+        # Построение графа
+        built = build(func_name, node)
+        data["errors"].extend(built["errors"])
+        cfg = built["cfg"]
+        if cfg is None:
+            continue
 
-            for err in errors_graph:
-                data["errors"].append(f"{file_path}: {err}")
-
-            for name in call_names:
-                clean_name = name.strip().strip('"')
-                if clean_name:
-                    data["calls"].add(clean_name)
-
-            cfg.remove_dangling_blocks()
-            data["cfg"] = cfg
-            
-            # Извлекаем параметры функции в упорядоченном виде
-            data["params"] = get_args_list_ordered(node)
-            # Извлекаем локальные переменные функции в упорядоченном виде
-            data["vars"] = get_vars_list_ordered(node)
-            
-            if graph_dir is not None:
-                render_cfg(
-                    cfg,
-                    filename=str(graph_dir / f"{input_file_name}_{func_name}"),
-                    fmt="svg",
-                )
-        
-        # Для функций без CFG тоже извлекаем параметры и переменные
-        if data.get("cfg") is None and data.get("tree") is not None:
-            data["params"] = get_args_list_ordered(data["tree"])
-            data["vars"] = get_vars_list_ordered(data["tree"])
+        data["calls"] |= built["calls"]
+        data["cfg"] = cfg
+        data["params"] = built["params"]
+        data["vars"] = built["vars"]
+
+        if graph_dir is not None:
+            render_cfg(
+                cfg,
+                filename=str(Path(graph_dir) / f"{input_file_name}_{func_name}"),
+                fmt="svg",
+            )
+
+    # Для функций без CFG тоже извлекаем параметры и переменные
+    if data is not None and data.get("cfg") is None and data.get("tree") is not None:
+        data["params"] = get_args_list_ordered(data["tree"])
+        data["vars"] = get_vars_list_ordered(data["tree"])
 
-    result = {
+
+def results_to_tuples(results_internal):
+    """results_internal -> { name: (calls, errors, cfg, tree, params, vars) }."""
+    return {
         name: (info["calls"], info["errors"], info["cfg"], info["tree"], info.get("params", []), info.get("vars", []))
         for name, info in results_internal.items()
     }
-    return result
 
-def write_errors_report(result, filename: str) -> bool:
+
+def load_view(session, file_path, tree_cache=None):
     """
-    Пишет человекочитаемый отчёт об ошибках в файл filename.
-    Файл создаётся только если действительно есть какие-то ошибки/проблемы.
-    
-    Returns:
-        bool: True, если ошибки были найдены и записаны в файл. False, если ошибок нет.
+    Дерево TreeViewNode файла: (view_root, errors_tree_build).
+    При синтаксических ошибках дерево не строится (view_root = None).
+    tree_cache — TreeCache; дерево неизменённого файла берётся из него.
+    """
+    data = open_source(file_path)
+    key = None
+    if tree_cache is not None:
+        key = tree_cache.key(data)
+        view_root = tree_cache.load(key)
+        if view_root is not None:
+            return view_root, []
+
+    root = session.parse_bytes(data).root_node
+    errors_tree_build = collect_syntax_errors(root)
+    if errors_tree_build:
+        return None, errors_tree_build
+
+    view_root, _ = build_tree_view(root)
+    if key is not None:
+        tree_cache.store(key, view_root)
+    return view_root, errors_tree_build
+
+
+def frontend_file(session, file_path, tree_dir=None, tree_format="text", tree_cache=None):
+    """
+    Вся независимая от других файлов работа над одним файлом: разбор,
+    дерево и его дамп. CFG здесь не строятся: какие объявления будут
+    приняты, зависит от предыдущих файлов (resolve_declarations).
+
+    Возвращает (view_root, errors_tree_build). Для файла с синтаксическими
+    ошибками дерево не строится: view_root = None.
+    """
+    view_root, errors_tree_build = load_view(session, file_path, tree_cache)
+    if errors_tree_build:
+        return None, errors_tree_build
+
+    if tree_dir is not None:
+        dump_tree_view(view_root, Path(tree_dir) / Path(file_path).stem, tree_format)
+    return view_root, errors_tree_build
+
+
+# ParserSession и TreeCache процесса-воркера (создаются в _init_frontend_worker)
+_worker_session = None
+_worker_tree_cache = None
+
+
+def _init_frontend_worker(lib_path, lang_name, grammar_dir, tree_cache_dir=None):
+    global _worker_session, _worker_tree_cache
+    _worker_session = ParserSession(lib_path, lang_name, grammar_dir)
+    if tree_cache_dir is not None:
+        _worker_tree_cache = TreeCache(tree_cache_dir, _worker_session)
+
+
+def _frontend_file_worker(file_path, tree_dir, tree_format):
+    view_root, errors_tree_build = frontend_file(
+        _worker_session, file_path, tree_dir, tree_format, _worker_tree_cache
+    )
+    # узлы tree-sitter не сериализуются и дальше фронтенда не нужны
+    if view_root is not None:
+        detach_parser_nodes(view_root)
+    return view_root, errors_tree_build
+
+
+def analyze_files_parallel(file_paths, session, jobs, tree_dir=None, graph_dir=None,
+                           tree_format="text", tree_cache_dir=None):
+    """
+    analyze_files на пуле процессов: файлы разбираются frontend_file
+    параллельно, затем по деревьям в исходном порядке file_paths
+    решается, какие объявления принимаются (resolve_declarations), и
+    CFG строятся в том же пуле только для них. После этого всё сливается
+    теми же правилами merge_file_functions, что и в последовательном режиме.
+    CFG принятых функций рисуются в пуле потоков (graphviz — внешний процесс).
+    """
+    # Загружаем (или собираем) язык один раз, воркерам передаём готовую библиотеку
+    session.language
+
+    file_paths = [str(p) for p in file_paths]
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_frontend_worker,
+        initargs=(session.lib_path, session.lang_name, session.grammar_dir, tree_cache_dir),
+    ) as pool:
+        frontends = list(pool.map(
+            _frontend_file_worker, file_paths, repeat(tree_dir), repeat(tree_format)
+        ))
+
+        # Перегрузки и повторные объявления отбрасываются до построения CFG
+        declared = {}
+        to_build = []  # (node, func_name, file_path)
+        for file_path, (view_root, _) in zip(file_paths, frontends):
+            for func_name, node, accepted in resolve_declarations(declared, view_root):
+                if accepted:
+                    to_build.append((node, func_name, file_path))
+
+        built = []
+        if to_build:
+            built = list(pool.map(
+                build_function, *zip(*to_build),
+                chunksize=max(1, len(to_build) // (jobs * 4)),
+            ))
+
+    built_by_node = {id(node): b for (node, _, _), b in zip(to_build, built)}
+    results_internal = {}
+    declared = {}
+    to_render = {}  # имя svg -> cfg; при совпадении имён побеждает последний, как при записи подряд
+
+    for file_path, (view_root, errors_tree_build) in zip(file_paths, frontends):
+        input_file_name = Path(file_path).stem
+
+        def build(func_name, node, input_file_name=input_file_name):
+            b = built_by_node[id(node)]
+            if graph_dir is not None and b["cfg"] is not None:
+                to_render[str(Path(graph_dir) / f"{input_file_name}_{func_name}")] = b["cfg"]
+            return b
+
+        merge_file_functions(
+            results_internal, declared, file_path,
+            view_root, errors_tree_build, build=build,
+        )
+
+    if to_render:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(
+                lambda item: render_cfg(item[1], filename=item[0], fmt="svg"),
+                to_render.items(),
+            ))
+
+    return results_to_tuples(results_internal)
+
+
+def analyze_files(file_paths, lib_path, lang_name, grammar_dir, out_dir=None, session=None, jobs=1,
+                  tree_format="text", tree_cache_dir=None):
+    """
+    Обработка набора файлов.
+
+    session — ParserSession; если не передан, создаётся один на все файлы,
+    чтобы язык загружался (или собирался) только один раз.
+    jobs — число процессов для фронтенда (см. analyze_files_parallel).
+    tree_format — формат дампов деревьев (TREE_DUMP_FORMATS).
+    tree_cache_dir — директория TreeCache (None — без кэша деревьев).
+    """
+    if session is None:
+        session = ParserSession(lib_path, lang_name, grammar_dir)
+
+    tree_dir = graph_dir = None
+    if out_dir is not None:
+        out_dir = Path(out_dir)
+        tree_dir = out_dir / "tree"
+        graph_dir = out_dir / "graph"
+        tree_dir.mkdir(parents=True, exist_ok=True)
+        graph_dir.mkdir(parents=True, exist_ok=True)
+
+    if jobs > 1 and len(file_paths) > 1:
+        return analyze_files_parallel(
+            file_paths, session, jobs, tree_dir, graph_dir, tree_format, tree_cache_dir
+        )
+
+    tree_cache = TreeCache(tree_cache_dir, session) if tree_cache_dir is not None else None
+
+    results_internal = {}  # func_name -> {"calls": set(), "errors": [], "cfg": None, "tree": None}
+    declared = {}  # func_name -> дерево объявления без тела / None (для проверки дубликатов)
+
+    for file_path in file_paths:
+        file_path = str(file_path)
+        input_file_name = Path(file_path).stem
+
+        view_root, errors_tree_build = load_view(session, file_path, tree_cache)
+        if tree_dir is not None and not errors_tree_build:
+            dump_tree_view(view_root, tree_dir / input_file_name, tree_format)
+
+        merge_file_functions(
+            results_internal, declared, file_path,
+            view_root, errors_tree_build, graph_dir=graph_dir,
+        )
+
+    return results_to_tuples(results_internal)
+
+def format_errors_report(result) -> list[str]:
+    """
+    Строки человекочитаемого отчёта об ошибках.
+    Пустой список — ошибок нет.
     """
     lines: list[str] = []
 
@@ -459,6 +742,19 @@ def write_errors_report(result, filename: str) -> bool:
         for fname in missing_funcs:
             lines.append(f"  - {fname}")
 
+    return lines
+
+
+def write_errors_report(result, filename: str) -> bool:
+    """
+    Пишет человекочитаемый отчёт об ошибках в файл filename.
+    Файл создаётся только если действительно есть какие-то ошибки/проблемы.
+    
+    Returns:
+        bool: True, если ошибки были найдены и записаны в файл. False, если ошибок нет.
+    """
+    lines = format_errors_report(result)
+
     # Если вообще нечего писать — не создаём файл и возвращаем False
     if not lines:
         return False
@@ -526,7 +822,7 @@ def calls_to_graphviz(result,
 
     # Добавляем рёбра: кто кого вызывает
     for caller, (calls, _errors, _cfg, tree, _params, _vars) in defined_funcs.items():
-        for callee in calls:
+        for callee in sorted(calls):
             # Узел для callee уже добавлен выше
             dot.edge(caller, callee)
 
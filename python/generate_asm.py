@@ -1,6 +1,8 @@
 from builtin_funcs import *
 from file_parser_to_graph import BUILTIN_TYPES
-import re
+from graph_parser import EdgeKind
+from ir import Op
+import io
 
 # Словарь встроенных функций и их возвращаемых типов
 # True означает, что функция возвращает значение, False - нет
@@ -22,10 +24,9 @@ BUILTIN_RETURNS = {
 for t_name in BUILTIN_TYPES:
     BUILTIN_RETURNS[t_name] = True
 
-def generate_preparation(out_file):
-    """Записывает подготовительные инструкции в файл."""
-    with open(out_file, 'w', encoding='utf-8') as f:
-        f.write("""[section code, code]
+def generate_preparation(f):
+    """Записывает подготовительные инструкции в текстовый поток."""
+    f.write("""[section code, code]
 ldsp 0xFFFC      ; even-aligned stack top
 ldhp 0x0000      ; init heap base
 setbp            ; establish caller bp before first call
@@ -34,28 +35,28 @@ hlt
 """)
 
 
-def generate_builtin_func(out_file):
+def generate_builtin_func(f):
     """Генерирует код для всех встроенных функций."""
-    generate_read_byte(out_file)
-    generate_send_byte(out_file)
-    generate_alloc(out_file)
-    generate_bool_constructor(out_file)
-    generate_byte_constructor(out_file)
-    generate_int_constructor(out_file)
-    generate_uint_constructor(out_file)
-    generate_long_constructor(out_file)
-    generate_ulong_constructor(out_file)
-    generate_char_constructor(out_file)
-    generate_bool_to_byte(out_file)
-    generate_byte_to_bool(out_file)
-    generate_byte_to_int(out_file)
-    generate_int_to_byte(out_file)
-    generate_int_to_uint(out_file)
-    generate_uint_to_int(out_file)
-    generate_int_to_long(out_file)
-    generate_long_to_int(out_file)
-    generate_long_to_ulong(out_file)
-    generate_ulong_to_long(out_file)
+    generate_read_byte(f)
+    generate_send_byte(f)
+    generate_alloc(f)
+    generate_bool_constructor(f)
+    generate_byte_constructor(f)
+    generate_int_constructor(f)
+    generate_uint_constructor(f)
+    generate_long_constructor(f)
+    generate_ulong_constructor(f)
+    generate_char_constructor(f)
+    generate_bool_to_byte(f)
+    generate_byte_to_bool(f)
+    generate_byte_to_int(f)
+    generate_int_to_byte(f)
+    generate_int_to_uint(f)
+    generate_uint_to_int(f)
+    generate_int_to_long(f)
+    generate_long_to_int(f)
+    generate_long_to_ulong(f)
+    generate_ulong_to_long(f)
 
 def process_store(tree, params_dict, f, vars_dict, var, funcs_returns=None):
     assert len(tree.children) == 1
@@ -90,11 +91,25 @@ BINOP_TO_CMD = {
     "<=": "le",
 }
 
+# Знаковые и беззнаковые типы для выбора команды сравнения
+SIGNED_TYPES = {'int', 'long'}
+UNSIGNED_TYPES = {'uint', 'ulong', 'byte'}
+
 def process_bin_op(tree, params_dict, f, vars_dict, bin_op_type, funcs_returns=None):
-    assert len(tree.children) == 2
-    process_ast(tree.children[0], params_dict, f, vars_dict, funcs_returns)
-    process_ast(tree.children[1], params_dict, f, vars_dict, funcs_returns)
+    # Цепочка a + b + c + ... вложена через левый операнд: спускаемся по ней
+    # циклом и выводим операции снизу вверх, без рекурсии на каждый уровень
+    chain = [tree]
+    while chain[-1].children[0].op is Op.BINARY:
+        chain.append(chain[-1].children[0])
     
+    process_ast(chain[-1].children[0], params_dict, f, vars_dict, funcs_returns)
+    for node in reversed(chain):
+        assert len(node.children) == 2
+        process_ast(node.children[1], params_dict, f, vars_dict, funcs_returns)
+        write_bin_op(node, f, node.operator)
+
+def write_bin_op(tree, f, bin_op_type):
+    """Команда бинарной операции над двумя операндами на стеке и маска типа."""
     # Для операций сравнения выбираем знаковую или беззнаковую версию
     comparison_ops = {'>', '<', '>=', '<='}
     if bin_op_type in comparison_ops:
@@ -103,19 +118,15 @@ def process_bin_op(tree, params_dict, f, vars_dict, bin_op_type, funcs_returns=N
         if tree.children[0] and hasattr(tree.children[0], 'type') and tree.children[0].type:
             operand_type = tree.children[0].type.strip().lower()
         
-        # Определяем, знаковый или беззнаковый тип
-        signed_types = {'int', 'long'}
-        unsigned_types = {'uint', 'ulong', 'byte'}
-        
         # Выбираем соответствующую инструкцию
         base_command = BINOP_TO_CMD.get(bin_op_type, None)
         if base_command is None:
             raise ValueError(f"Не обработанная бинарная инструкция {bin_op_type}")
         
-        if operand_type in unsigned_types:
+        if operand_type in UNSIGNED_TYPES:
             # Используем беззнаковую версию
             asm_command = base_command + '_u'
-        elif operand_type in signed_types:
+        elif operand_type in SIGNED_TYPES:
             # Используем знаковую версию
             asm_command = base_command
         else:
@@ -313,83 +324,63 @@ def process_const_op(tree, params_dict, f, vars_dict, const_name, const_val):
             raise ValueError(f"Неизвестное обозначение {const_name}")
         
 
-STORE_RE = re.compile(r'^store\(([A-Za-z_][A-Za-z_0-9]*)\)$')
-BIN_OP_RE = re.compile(r'^(<<|>>|<=|>=|=|!=|\+|-|\*|/|%|&|\||\^|<|>|\|\||&&)$')
-UN_OP_RE = re.compile(r'^(~|!)$')
-INDEX_RE = re.compile(r'^index$')
-LOAD_RE = re.compile(r'^load\(([A-Za-z_][A-Za-z_0-9]*)(\[\])?\)$')
-STORE_AT_RE = re.compile(r'^store_at\(([A-Za-z_][A-Za-z_0-9]*)\)$')
-CALL_RE = re.compile(r'^call\(([A-Za-z_][A-Za-z_0-9]*)\)$')
-CONST_RE = re.compile(r'^const\((.*)\((.*)\)\)$')
-
 def process_ast(tree, params_dict, f, vars_dict, funcs_returns=None):
     if tree is None:
         return
     
-    store_match = STORE_RE.match(tree.label)
-    if store_match:
-        process_store(tree, params_dict, f, vars_dict, store_match.group(1), funcs_returns)
-        return
-    
-    bin_op_match = BIN_OP_RE.match(tree.label)
-    if bin_op_match:
-        process_bin_op(tree, params_dict, f, vars_dict, bin_op_match.group(1), funcs_returns)
-        return
-    
-    un_op_match = UN_OP_RE.match(tree.label)
-    if un_op_match:
-        process_un_op(tree, params_dict, f, vars_dict, un_op_match.group(1), funcs_returns)
-        return
-    
-    index_match = INDEX_RE.match(tree.label)
-    if index_match:
-        process_index_op(tree, params_dict, f, vars_dict, funcs_returns)
-        return
-
-    load_match = LOAD_RE.match(tree.label)
-    if load_match:
-        process_load_op(tree, params_dict, f, vars_dict, load_match.group(1))
-        return
-    
-    store_at_match = STORE_AT_RE.match(tree.label)
-    if store_at_match:
-        process_store_at_op(tree, params_dict, f, vars_dict, store_at_match.group(1), funcs_returns)
-        return
-
-    call_match = CALL_RE.match(tree.label)
-    if call_match:
-        process_call_op(tree, params_dict, f, vars_dict, call_match.group(1), funcs_returns)
-        return
-    
-    const_match = CONST_RE.match(tree.label)
-    if const_match:
-        process_const_op(tree, params_dict, f, vars_dict, const_match.group(1), const_match.group(2))
-        return
-    
-    raise ValueError(f"Неизвестный элемент {tree.label}")
+    match tree.op:
+        case Op.STORE:
+            process_store(tree, params_dict, f, vars_dict, tree.name, funcs_returns)
+        case Op.BINARY:
+            process_bin_op(tree, params_dict, f, vars_dict, tree.operator, funcs_returns)
+        case Op.UNARY:
+            process_un_op(tree, params_dict, f, vars_dict, tree.operator, funcs_returns)
+        case Op.INDEX:
+            process_index_op(tree, params_dict, f, vars_dict, funcs_returns)
+        case Op.LOAD | Op.LOAD_ARRAY:
+            process_load_op(tree, params_dict, f, vars_dict, tree.name)
+        case Op.STORE_AT:
+            process_store_at_op(tree, params_dict, f, vars_dict, tree.name, funcs_returns)
+        case Op.CALL:
+            process_call_op(tree, params_dict, f, vars_dict, tree.name, funcs_returns)
+        case Op.CONST:
+            process_const_op(tree, params_dict, f, vars_dict, tree.lit_type, tree.value)
+        case _:
+            raise ValueError(f"Неизвестный элемент {tree.label}")
 
 def process_block(f_name, block, params_dict, f, vars_dict, funcs_returns=None):
+    # const_fold импортирует generate_asm, поэтому импорт здесь
+    from const_fold import fold_constants
+
     f.write(f'.id{block.id}:\n')
     
-    process_ast(block.tree, params_dict, f, vars_dict, funcs_returns)
+    # Константные подвыражения сворачиваются в один push
+    for tree in block.trees:
+        process_ast(fold_constants(tree), params_dict, f, vars_dict, funcs_returns)
     
     if len(block.succs) == 0:
         f.write(f'    jmp .out\n')
-    elif len(block.succs) == 1:
+    elif block.succs[0][1] is EdgeKind.FALLTHROUGH:
         succ_id, _ = block.succs[0]
         f.write(f'    jmp .id{succ_id}\n')
     else:
-        # Два перехода: True и False
-        true_succ = next(succ_id for succ_id, label in block.succs if label.lower() == "true")
-        false_succ = next(succ_id for succ_id, label in block.succs if label.lower() == "false")
-        f.write(f'    jnz .id{true_succ}\n')
-        f.write(f'    jmp .id{false_succ}\n')
+        # Два перехода: True и False; ветка без ребра ведёт на выход
+        f.write(f'    jnz {branch_target(block, EdgeKind.TRUE)}\n')
+        f.write(f'    jmp {branch_target(block, EdgeKind.FALSE)}\n')
+
+def branch_target(block, kind):
+    """Метка перехода по ветке условия (.out, если ветка выходит из функции)."""
+    try:
+        return f'.id{block.successor(kind)}'
+    except KeyError:
+        return '.out'
 
 def process_cfg(f_name, f_cfg, f_tree, params_dict, out_file, vars_dict, funcs_returns=None):
     for _, block in f_cfg.blocks.items():
         process_block(f_name, block, params_dict, out_file, vars_dict, funcs_returns)
 
-def process_func(f_name, f_cfg, f_tree, f_params, out_file, vars, funcs_returns=None):
+def write_func(f_name, f_cfg, f_tree, f_params, f, vars, funcs_returns=None):
+    """Пишет код одной функции в открытый текстовый поток f."""
     # Преобразуем vars из списка кортежей в словарь с смещениями
     vars_dict = {}
     for index, (var_name, var_type) in enumerate(vars):
@@ -409,36 +400,49 @@ def process_func(f_name, f_cfg, f_tree, f_params, out_file, vars, funcs_returns=
         if func_type and func_type[0] is not None:
             has_return = True
     
-    with open(out_file, 'a', encoding='utf-8') as f:
-        f.write(f'\n{f_name}:\n')
-        
-        for var_name, var_type in vars:
-            f.write(f'    push 0    ; {var_name}\n')
-        
-        process_cfg(f_name, f_cfg, f_tree, params_dict, f, vars_dict, funcs_returns)
-        f.write(f'.out:\n')
-        
-        # Если функция возвращает значение, перемещаем его из переменной с именем функции в bp + 8
-        if has_return and f_name in vars_dict:
-            var_offset = vars_dict[f_name][1]
-            f.write(f'    ldbp {var_offset}  ; load return value from {f_name}\n')
-            f.write(f'    stbp 8  ; store return value at bp + 8\n')
-        
-        f.write('    ret\n')
-
-def generate_asm(typed_blocks, out_file, funcs_returns=None):
-    # Записываем подготовительные инструкции
-    generate_preparation(out_file)
+    f.write(f'\n{f_name}:\n')
+    
+    for var_name, var_type in vars:
+        f.write(f'    push 0    ; {var_name}\n')
+    
+    process_cfg(f_name, f_cfg, f_tree, params_dict, f, vars_dict, funcs_returns)
+    f.write(f'.out:\n')
     
-    # Записываем встроенные функции
-    generate_builtin_func(out_file)
+    # Если функция возвращает значение, перемещаем его из переменной с именем функции в bp + 8
+    if has_return and f_name in vars_dict:
+        var_offset = vars_dict[f_name][1]
+        f.write(f'    ldbp {var_offset}  ; load return value from {f_name}\n')
+        f.write(f'    stbp 8  ; store return value at bp + 8\n')
     
-    # Обрабатываем пользовательские функции
-    for f_name, (_, _, cfg, tree, params, vars) in typed_blocks.items():
-        # Пропускаем псевдо-узлы файлов
-        if f_name.startswith('<file:'):
-            continue
-        # Пропускаем функции без CFG
-        if cfg is None:
-            continue
-        process_func(f_name, cfg, tree, params, out_file, vars, funcs_returns)
\ No newline at end of file
+    f.write('    ret\n')
+
+def func_to_asm(f_name, f_cfg, f_tree, f_params, vars, funcs_returns=None) -> str:
+    """Код одной функции строкой (для кэширования по функциям)."""
+    buf = io.StringIO()
+    write_func(f_name, f_cfg, f_tree, f_params, buf, vars, funcs_returns)
+    return buf.getvalue()
+
+def prelude_to_asm() -> str:
+    """Подготовительные инструкции и встроенные функции строкой."""
+    buf = io.StringIO()
+    generate_preparation(buf)
+    generate_builtin_func(buf)
+    return buf.getvalue()
+
+def generate_asm(typed_blocks, out_file, funcs_returns=None):
+    with open(out_file, 'w', encoding='utf-8') as f:
+        # Записываем подготовительные инструкции
+        generate_preparation(f)
+
+        # Записываем встроенные функции
+        generate_builtin_func(f)
+
+        # Обрабатываем пользовательские функции
+        for f_name, (_, _, cfg, tree, params, vars) in typed_blocks.items():
+            # Пропускаем псевдо-узлы файлов
+            if f_name.startswith('<file:'):
+                continue
+            # Пропускаем функции без CFG
+            if cfg is None:
+                continue
+            write_func(f_name, cfg, tree, params, f, vars, funcs_returns)
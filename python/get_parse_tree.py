@@ -1,6 +1,12 @@
 import argparse
+import hashlib
+import importlib
+import mmap
 import os
 import subprocess
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from ctypes import CDLL, PYFUNCTYPE, pythonapi, c_void_p, c_char_p, py_object
 from pathlib import Path
 
@@ -95,25 +101,99 @@ def parse_cli():
 
     return grammar_dir, lang_name, a.file_path, a.out_file_path, lib_path
 
+def shared_lib_suffix() -> str:
+    """Расширение shared-библиотеки для текущей платформы."""
+    if sys.platform.startswith("win") or sys.platform == "cygwin":
+        return ".dll"
+    if sys.platform == "darwin":
+        return ".dylib"
+    return ".so"
+
+
+def grammar_hash(grammar_dir: str) -> str:
+    """
+    Хэш входов сборки: grammar.js, src/scanner.c (если есть)
+    и версия ABI tree_sitter.LANGUAGE_VERSION.
+    """
+    h = hashlib.sha256()
+    h.update(f"abi={tree_sitter.LANGUAGE_VERSION}\n".encode())
+    for rel in ("grammar.js", os.path.join("src", "scanner.c")):
+        path = os.path.join(grammar_dir, rel)
+        if not os.path.exists(path):
+            continue
+        h.update(rel.replace(os.sep, "/").encode() + b"\0")
+        with open(path, "rb") as f:
+            h.update(f.read())
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+
+@contextmanager
+def _build_lock(lock_path: str):
+    """Межпроцессная блокировка на время сборки (fcntl / msvcrt)."""
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
 def build_parser(grammar_dir: str, lang_name: str) -> str:
-    """Собрать shared-библиотеку в <grammar_dir>/build/<lang_name>.(dll|so|dylib)."""
+    """
+    Собрать shared-библиотеку в <grammar_dir>/build/<lang_name>-<hash>.(dll|so|dylib).
+
+    hash считается по grammar_hash(); если библиотека с таким хэшем уже
+    собрана, tree-sitter generate/build не запускаются. Сборка идёт под
+    файловой блокировкой, а готовый файл появляется атомарно (os.replace),
+    поэтому несколько одновременных запусков не мешают друг другу.
+    """
     out_dir = os.path.join(grammar_dir, "build")
     os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f"{lang_name}.dll")
-
-    subprocess.run(
-        ["tree-sitter", "generate", "--abi", str(tree_sitter.LANGUAGE_VERSION)],
-        cwd=grammar_dir,
-        check=True,
-    )
-    subprocess.run(
-        ["tree-sitter", "build", "-o", out_path], cwd=grammar_dir, check=True
+    out_path = os.path.join(
+        out_dir, f"{lang_name}-{grammar_hash(grammar_dir)}{shared_lib_suffix()}"
     )
+    if os.path.exists(out_path):
+        return out_path
+
+    with _build_lock(os.path.join(out_dir, f"{lang_name}.lock")):
+        # Пока ждали блокировку, библиотеку мог собрать другой процесс
+        if os.path.exists(out_path):
+            return out_path
+
+        tmp_path = f"{out_path}.{os.getpid()}.tmp{shared_lib_suffix()}"
+        subprocess.run(
+            ["tree-sitter", "generate", "--abi", str(tree_sitter.LANGUAGE_VERSION)],
+            cwd=grammar_dir,
+            check=True,
+        )
+        subprocess.run(
+            ["tree-sitter", "build", "-o", tmp_path], cwd=grammar_dir, check=True
+        )
+        os.replace(tmp_path, out_path)
     return out_path
 
 
-def load_and_parse(lib_path: str, lang_name: str, file_path: str):
-    """Загрузить язык из DLL, распарсить файл, вернуть корневой узел."""
+def load_language(lib_path: str, lang_name: str) -> Language:
+    """Загрузить язык из DLL (функция tree_sitter_<lang_name>)."""
     cdll = CDLL(os.path.abspath(lib_path))
     func_name = f"tree_sitter_{lang_name}"
     if not hasattr(cdll, func_name) and hasattr(cdll, func_name + "_language"):
@@ -126,18 +206,252 @@ def load_and_parse(lib_path: str, lang_name: str, file_path: str):
         ("PyCapsule_New", pythonapi)
     )
     capsule = PyCapsule_New(ptr, b"tree_sitter.Language", None)
-    lang = Language(capsule)
+    return Language(capsule)
+
+
+def load_binding_language(lang_name: str) -> Language | None:
+    """
+    Взять язык из установленного пакета tree_sitter_<lang_name>
+    (его _binding собирается tree-sitter/setup.py).
+    Возвращает None, если пакет не установлен или несовместим.
+    """
+    try:
+        module = importlib.import_module(f"tree_sitter_{lang_name}")
+    except ImportError:
+        return None
+    try:
+        return Language(module.language())
+    except (AttributeError, TypeError, ValueError):
+        return None
+
 
-    parser = Parser(lang)
+def open_source(file_path: str):
+    """
+    Содержимое файла для парсера без копирования в bytes: файл отображается
+    в память (mmap) только для чтения. Tree держит ссылку на этот буфер,
+    и Node.text режет текст листьев прямо из него по смещениям.
+    Пустой файл mmap не поддерживает — для него возвращается b"".
+    """
     with open(file_path, "rb") as f:
-        data = f.read()
-    tree = parser.parse(data, encoding="utf8")
-    return tree.root_node
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b""
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    """Длина общего префикса (бинарный поиск по срезам, сравнение в C)."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_len(a: bytes, b: bytes, limit: int) -> int:
+    """Длина общего суффикса, не заходящего в первые limit байт."""
+    lo, hi = 0, min(len(a), len(b)) - limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _byte_point(data: bytes, offset: int) -> tuple[int, int]:
+    """(row, column) байта offset — в тех же единицах, что Node.start_point."""
+    row = data.count(b"\n", 0, offset)
+    column = offset - (data.rfind(b"\n", 0, offset) + 1)
+    return row, column
+
+
+def compute_edit(old: bytes, new: bytes) -> dict | None:
+    """
+    Минимальная правка old -> new в виде аргументов Tree.edit.
+    Возвращает None, если содержимое не изменилось.
+    """
+    if old == new:
+        return None
+    start = _common_prefix_len(old, new)
+    suffix = _common_suffix_len(old, new, start)
+    old_end = len(old) - suffix
+    new_end = len(new) - suffix
+    return {
+        "start_byte": start,
+        "old_end_byte": old_end,
+        "new_end_byte": new_end,
+        "start_point": _byte_point(old, start),
+        "old_end_point": _byte_point(old, old_end),
+        "new_end_point": _byte_point(new, new_end),
+    }
+
+
+@dataclass
+class IncrementalParse:
+    """
+    Результат ParserSession.reparse.
+
+    tree           — новое дерево
+    edit           — аргументы Tree.edit (None — первый разбор или файл не менялся)
+    changed_ranges — Tree.changed_ranges старого и нового дерева
+                     (None при первом разборе: изменилось всё)
+    """
+    tree: tree_sitter.Tree
+    edit: dict | None = None
+    changed_ranges: list | None = field(default_factory=list)
+
+    def changed_items(self) -> list[int]:
+        """
+        Индексы узлов верхнего уровня (sourceItem -> funcDef) нового дерева,
+        которые задеты правкой или changed_ranges.
+        """
+        root = self.tree.root_node
+        if self.changed_ranges is None:
+            return list(range(root.child_count))
+
+        spans = [(r.start_byte, r.end_byte) for r in self.changed_ranges]
+        if self.edit is not None:
+            spans.append((self.edit["start_byte"], self.edit["new_end_byte"]))
+
+        changed = []
+        for i, item in enumerate(root.children):
+            for start, end in spans:
+                # пустой диапазон (чистое удаление) задевает узел, если лежит на нём
+                if item.start_byte <= end and start <= item.end_byte:
+                    changed.append(i)
+                    break
+        return changed
+
+
+class ParserSession:
+    """
+    Один загруженный язык и один Parser на весь запуск.
+
+    Библиотека загружается (а в режиме грамматики — собирается) один раз
+    при первом обращении, после чего parse() можно вызывать для любого
+    количества файлов.
+
+    Если не задан ни lib_path, ни grammar_dir, язык берётся из установленного
+    пакета tree_sitter_<lang_name>, без CDLL/PyCapsule. Явно указанная
+    библиотека или грамматика всегда важнее пакета: он мог быть собран
+    из другой версии grammar.js. После загрузки в loader записано, какой
+    путь сработал: "binding" или "ctypes".
+    """
+
+    def __init__(self, lib_path, lang_name, grammar_dir=None, use_binding=True):
+        self.lib_path = lib_path
+        self.lang_name = lang_name
+        self.grammar_dir = grammar_dir
+        self.use_binding = use_binding
+        self.loader = None
+        self._language = None
+        self._parser = None
+        self._fingerprint = None
+        # file_path -> (bytes, Tree) для инкрементального режима
+        self._trees: dict[str, tuple[bytes, tree_sitter.Tree]] = {}
+
+    @property
+    def language(self) -> Language:
+        if (
+            self._language is None
+            and self.use_binding
+            and not self.lib_path
+            and not self.grammar_dir
+        ):
+            self._language = load_binding_language(self.lang_name)
+            if self._language is not None:
+                self.loader = "binding"
+        if self._language is None:
+            lib_path = self.lib_path
+            if not lib_path:
+                if not self.grammar_dir:
+                    raise FileNotFoundError(
+                        f"Пакет tree_sitter_{self.lang_name} не установлен, "
+                        "а библиотека и грамматика не указаны"
+                    )
+                lib_path = build_parser(self.grammar_dir, self.lang_name)
+                self.lib_path = lib_path
+            self._language = load_language(lib_path, self.lang_name)
+            self.loader = "ctypes"
+        return self._language
+
+    @property
+    def grammar_fingerprint(self) -> str:
+        """
+        Отпечаток загруженного языка для ключей кэшей: версия ABI, таблицы
+        типов узлов и полей, число состояний разбора, а для библиотеки,
+        загруженной через ctypes, — ещё и хэш её файла.
+        """
+        if self._fingerprint is None:
+            lang = self.language
+            h = hashlib.sha256()
+            h.update(f"{self.lang_name} abi={lang.abi_version} states={lang.parse_state_count}\n".encode())
+            for i in range(lang.node_kind_count):
+                h.update(f"kind={lang.node_kind_for_id(i)}:{lang.node_kind_is_named(i)}\n".encode())
+            for i in range(1, lang.field_count + 1):
+                h.update(f"field={lang.field_name_for_id(i)}\n".encode())
+            if self.loader == "ctypes":
+                with open(self.lib_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 16), b""):
+                        h.update(chunk)
+            self._fingerprint = h.hexdigest()[:16]
+        return self._fingerprint
+
+    @property
+    def parser(self) -> Parser:
+        if self._parser is None:
+            self._parser = Parser(self.language)
+        return self._parser
+
+    def parse_bytes(self, data):
+        """Распарсить исходник (bytes или буфер, например mmap), вернуть Tree."""
+        return self.parser.parse(data, encoding="utf8")
+
+    def parse(self, file_path: str):
+        """Распарсить файл, вернуть корневой узел."""
+        return self.parse_bytes(open_source(file_path)).root_node
+
+    def reparse(self, file_path: str, data: bytes | None = None) -> IncrementalParse:
+        """
+        Инкрементальный разбор: хранит предыдущее дерево файла, переносит
+        в него правку (Tree.edit) и перепарсивает с old_tree.
+        data — новое содержимое; если не задано, файл читается с диска.
+        """
+        if data is None:
+            with open(file_path, "rb") as f:
+                data = f.read()
+
+        previous = self._trees.get(file_path)
+        if previous is None:
+            tree = self.parse_bytes(data)
+            self._trees[file_path] = (data, tree)
+            return IncrementalParse(tree=tree, changed_ranges=None)
+
+        old_data, old_tree = previous
+        edit = compute_edit(old_data, data)
+        if edit is None:
+            return IncrementalParse(tree=old_tree)
+
+        old_tree.edit(**edit)
+        tree = self.parser.parse(data, old_tree, encoding="utf8")
+        self._trees[file_path] = (data, tree)
+        return IncrementalParse(
+            tree=tree, edit=edit, changed_ranges=old_tree.changed_ranges(tree)
+        )
+
+    def forget(self, file_path: str) -> None:
+        """Выбросить сохранённое дерево файла."""
+        self._trees.pop(file_path, None)
+
+
+def load_and_parse(lib_path: str, lang_name: str, file_path: str):
+    """Загрузить язык из DLL, распарсить файл, вернуть корневой узел."""
+    return ParserSession(lib_path, lang_name).parse(file_path)
 
 def get_tree_root(lib_path, lang_name, file_path, grammar_dir):
-    if lib_path:
-        root = load_and_parse(lib_path, lang_name, file_path)
-    else:
-        built_lib = build_parser(grammar_dir, lang_name)
-        root = load_and_parse(built_lib, lang_name, file_path)
-    return root 
\ No newline at end of file
+    return ParserSession(lib_path, lang_name, grammar_dir).parse(file_path)
@@ -1,56 +1,205 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple, Union
+from enum import Enum
+from typing import List, Dict, Optional, Set, Tuple, Union
 from tree_parser import TreeViewNode, tree_view_to_str
 from graphviz import Digraph
 from ast_generator import parse_expr
+from ir import IRNode, Op
 
 #######################################################################
 # DATA STRUCT
 #######################################################################
 
+class EdgeKind(Enum):
+    """Вид ребра: переход по истинному/ложному условию или безусловный."""
+    TRUE = "True"
+    FALSE = "False"
+    FALLTHROUGH = "fallthrough"
+
+
 @dataclass
 class Block:
     """
     Один блок графа (будущий прямоугольник на картинке).
 
     id      - уникальный номер блока
-    label   - текст внутри блока (или можно класть сюда указатель на дерево операций)
-    succs   - список исходящих рёбер вида (id_следующего_блока, метка_ребра)
-              метка_ребра, например, "True"/"False" для if.
+    label   - текст внутри блока; у блоков с деревьями считается из деревьев
+              при первом обращении (нужен только для отрисовки)
+    trees   - деревья операций блока в порядке выполнения; у блоков-меток
+              (begin, end_if, ...) пусто. Если у блока два выхода, последнее
+              дерево — условие перехода.
+    succs   - список исходящих рёбер вида (id_следующего_блока, EdgeKind);
+              у блока с условием — одно ребро TRUE и одно FALSE. Блок без
+              рёбер и ветка условия без ребра ведут на выход из функции.
+    preds   - id блоков, из которых есть ребро в этот блок. Поддерживается
+              методами CFG, succs напрямую лучше не менять.
     """
     id: int
-    label: str
-    tree: TreeViewNode = field(default=None)
-    succs: List[Tuple[int, Optional[str]]] = field(default_factory=list)
+    _label: Optional[str] = None
+    trees: List[TreeViewNode] = field(default_factory=list)
+    succs: List[Tuple[int, EdgeKind]] = field(default_factory=list)
+    preds: Set[int] = field(default_factory=set)
+
+    @property
+    def label(self) -> str:
+        if self._label is None:
+            self._label = "".join(tree_view_to_str(tree) for tree in self.trees)
+        return self._label
+
+    @label.setter
+    def label(self, value: Optional[str]) -> None:
+        # None — пересчитать из деревьев при следующем обращении
+        self._label = value
+
+    def successor(self, kind: EdgeKind) -> int:
+        """id блока, куда ведёт ребро данного вида."""
+        for succ_id, succ_kind in self.succs:
+            if succ_kind is kind:
+                return succ_id
+        raise KeyError(f"У блока {self.id} нет ребра {kind.name}")
+
+    @property
+    def exits(self) -> bool:
+        """Какой-то путь из блока сразу выходит из функции."""
+        if not self.succs:
+            return True
+        # У условия рёбер TRUE и FALSE два, пока ни одно не ведёт на выход
+        return len(self.succs) == 1 and self.succs[0][1] is not EdgeKind.FALLTHROUGH
+
+
+# Служебные блоки без дерева, которые строит парсер: только точки соединения
+MARKER_LABELS = frozenset((
+    "begin", "end", "end_if", "end_while", "start_repeat", "end_repeat", "break",
+))
+
+
+def is_marker(block: Block) -> bool:
+    return not block.trees and block.label in MARKER_LABELS
+
+
+def is_error(block: Block) -> bool:
+    """Блок-заглушка на месте выражения, которое не удалось разобрать."""
+    return not block.trees and block.label not in MARKER_LABELS
 
 
 @dataclass
 class CFG:
     """
     Весь граф потока управления.
+
+    Рёбра меняются только методами ниже: они держат succs и preds
+    согласованными, и каждое изменение стоит O(число рёбер затронутых
+    блоков), а не обход всего графа. Любое изменение сбрасывает
+    результаты анализов, сохранённые через cached().
     """
     blocks: Dict[int, Block] = field(default_factory=dict)
     next_id: int = 0  # счётчик для выдачи свежих id
     errors: List[str] = field(default_factory=list) 
     call_names: set[str] = field(default_factory=set) 
+    _analyses: Dict[object, object] = field(default_factory=dict, repr=False, compare=False)
+
+    def cached(self, key, compute):
+        """
+        Результат анализа compute(self), посчитанный один раз до
+        следующего изменения графа. key — имя анализа и его параметры.
+        """
+        if key not in self._analyses:
+            self._analyses[key] = compute(self)
+        return self._analyses[key]
 
-    def new_block(self, label: str, tree: TreeViewNode = None) -> Block:
+    def invalidate(self) -> None:
+        """Сбрасывает сохранённые анализы (после изменения деревьев блоков)."""
+        if self._analyses:
+            self._analyses.clear()
+
+    def new_block(self, label: str = None, tree: TreeViewNode = None) -> Block:
         """
-        Создаёт новый блок с данным текстом.
+        Создаёт новый блок с данным текстом или деревом
+        (текст блока с деревом строится лениво).
         """
-        b = Block(self.next_id, label, tree)
+        b = Block(self.next_id, label, [tree] if tree is not None else [])
+        self.invalidate()
         self.blocks[b.id] = b
         self.next_id += 1
         return b
 
-    def add_edge(self, src: Block, dst: Block, label: Optional[str] = None):
+    def add_edge(self, src: Block, dst: Block, kind: EdgeKind = EdgeKind.FALLTHROUGH):
         """
-        Добавляет ребро src -> dst.
-        label используется для подписей вроде True/False.
+        Добавляет ребро src -> dst вида kind.
         """
         if dst is not None and src is not None:
-            src.succs.append((dst.id, label))
-            
+            self.invalidate()
+            src.succs.append((dst.id, kind))
+            dst.preds.add(src.id)
+
+    def remove_edges(self, src: Block, dst_id: int) -> None:
+        """Удаляет все рёбра src -> dst_id."""
+        self.invalidate()
+        src.succs = [(succ_id, kind) for succ_id, kind in src.succs if succ_id != dst_id]
+        dst = self.blocks.get(dst_id)
+        if dst is not None:
+            dst.preds.discard(src.id)
+
+    def retarget_edges(self, src: Block, old_id: int, new_id: int) -> None:
+        """Перенаправляет рёбра src -> old_id в new_id, вид рёбер сохраняется."""
+        self.invalidate()
+        src.succs = [
+            (new_id if succ_id == old_id else succ_id, kind)
+            for succ_id, kind in src.succs
+        ]
+        old = self.blocks.get(old_id)
+        if old is not None:
+            old.preds.discard(src.id)
+        self.blocks[new_id].preds.add(src.id)
+
+    def remove_block(self, b_id: int) -> None:
+        """Удаляет блок вместе со всеми его входящими и исходящими рёбрами."""
+        self.invalidate()
+        block = self.blocks.pop(b_id)
+        for succ_id, _ in block.succs:
+            succ = self.blocks.get(succ_id)
+            if succ is not None:
+                succ.preds.discard(b_id)
+        for pred_id in block.preds:
+            pred = self.blocks.get(pred_id)
+            if pred is not None:
+                pred.succs = [(succ_id, kind) for succ_id, kind in pred.succs if succ_id != b_id]
+
+    def split_block(self, block: Block, index: int) -> Block:
+        """
+        Делит блок перед деревом index: деревья с index и все выходы
+        переходят в новый блок, старый безусловно переходит в новый.
+        Возвращает новый блок.
+        """
+        tail = self.new_block()
+        tail.trees = block.trees[index:]
+        del block.trees[index:]
+        block.label = None
+        self._move_succs(block, tail)
+        self.add_edge(block, tail)
+        return tail
+
+    def merge_blocks(self, block: Block, merged: Block) -> None:
+        """
+        Приписывает merged в конец block: block забирает деревья и выходы
+        merged, merged удаляется. Рёбра, входившие в merged, не переносятся.
+        """
+        self.remove_edges(block, merged.id)
+        if merged.trees:
+            block.trees.extend(merged.trees)
+            block.label = None
+        self._move_succs(merged, block)
+        self.remove_block(merged.id)
+
+    def _move_succs(self, src: Block, dst: Block) -> None:
+        self.invalidate()
+        dst.succs.extend(src.succs)
+        for succ_id, _ in src.succs:
+            preds = self.blocks[succ_id].preds
+            preds.discard(src.id)
+            preds.add(dst.id)
+        src.succs = []
+
     def remove_dangling_blocks(self, entry_id: int = 0, exit_id: int = 1) -> None:
         """Удаляет все блоки, недостижимые из entry_id, оставляя entry/exit."""
         reachable = set()
@@ -73,24 +222,107 @@ class CFG:
         if exit_id in self.blocks:
             reachable.add(exit_id)
 
-        # удаляем все недостижимые блоки
-        for b_id in list(self.blocks.keys()):
-            if b_id not in reachable:
-                del self.blocks[b_id]
+        # удаляем все недостижимые блоки вместе с их рёбрами
+        for b_id in [b_id for b_id in self.blocks if b_id not in reachable]:
+            self.remove_block(b_id)
+
+    def coalesce_blocks(self, entry_id: int = 0) -> None:
+        """
+        Собирает базовые блоки: убирает пустые блоки-метки и сливает
+        цепочки операторов без ветвлений в один блок.
+
+        1. Блок-метка с одним выходом удаляется, входящие в него рёбра
+           (со своими видами) ведут сразу к его преемнику.
+        2. Блок-метка без выходов (конец функции) удаляется вместе с
+           входящими рёбрами: блок без рёбер и ветка условия без ребра
+           переходят прямо на выход. Метка остаётся, только если в неё
+           ведут обе ветки одного условия.
+        3. Блок A с единственным безусловным выходом в B, у которого A —
+           единственный вход, забирает деревья и выходы B; B удаляется.
+        4. Если вход остался пустой меткой, его место занимает преемник:
+           вход забирает его деревья и выходы, а рёбра в преемника ведут
+           во вход. Так id входа не меняется, а код функции начинается
+           сразу с первого оператора.
+
+        Блоки, куда ведут несколько рёбер, сохраняют свои id — это метки
+        переходов. Блоки с ошибкой разбора не сливаются, чтобы их текст
+        остался на графе.
+        """
+        for b_id in list(self.blocks):
+            block = self.blocks[b_id]
+            if b_id == entry_id or not is_marker(block) or len(block.succs) != 1:
+                continue
+            succ_id, _ = block.succs[0]
+            if succ_id == b_id:
+                continue
+            for pred_id in list(block.preds):
+                self.retarget_edges(self.blocks[pred_id], b_id, succ_id)
+            self.remove_block(b_id)
 
-        # подчистим succs от ссылок на удалённые блоки
-        for block in self.blocks.values():
-            block.succs = [
-                (dst_id, lbl)
-                for (dst_id, lbl) in block.succs
-                if dst_id in self.blocks
-            ]
+        for b_id in list(self.blocks):
+            block = self.blocks[b_id]
+            if b_id == entry_id or not is_marker(block) or block.succs:
+                continue
+            if any(
+                len(self.blocks[pred_id].succs) == 2
+                and all(succ_id == b_id for succ_id, _ in self.blocks[pred_id].succs)
+                for pred_id in block.preds
+            ):
+                continue
+            self.remove_block(b_id)
+
+        for a_id in list(self.blocks):
+            block = self.blocks.get(a_id)
+            if block is None:
+                continue
+            while len(block.succs) == 1:
+                b_id, kind = block.succs[0]
+                merged = self.blocks[b_id]
+                if kind is not EdgeKind.FALLTHROUGH:
+                    break
+                if b_id in (a_id, entry_id) or len(merged.preds) != 1:
+                    break
+                if is_error(block) or is_error(merged):
+                    break
+                self.merge_blocks(block, merged)
+
+        entry = self.blocks.get(entry_id)
+        if entry is not None and is_marker(entry) and len(entry.succs) == 1:
+            succ_id, kind = entry.succs[0]
+            first = self.blocks[succ_id]
+            if succ_id != entry_id and kind is EdgeKind.FALLTHROUGH and not is_error(first):
+                for pred_id in list(first.preds):
+                    if pred_id != entry_id:
+                        self.retarget_edges(self.blocks[pred_id], succ_id, entry_id)
+                self.merge_blocks(entry, first)
 
 #######################################################################
 # PARSER
 #######################################################################
 
-def parse_block(tree: TreeViewNode, graph: CFG, before: Block, label: str = None, end_cycle: Block = None):
+# Разбор операторов — генераторы: вложенный оператор не разбирается
+# рекурсивным вызовом, а отдаётся через yield как подзадача, и её
+# результат (последний блок) приходит обратно в yield. run_task исполняет
+# подзадачи на явном стеке, поэтому глубина вложенности операторов
+# ограничена только памятью.
+
+def run_task(task):
+    """Выполняет генератор разбора вместе со всеми его подзадачами."""
+    stack = [task]
+    value = None
+    while stack:
+        try:
+            subtask = stack[-1].send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+        else:
+            stack.append(subtask)
+            value = None
+    return value
+
+
+def parse_block(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH, end_cycle: Block = None):
     """
     [0] 'begin'
     [1->-2] statement*
@@ -103,31 +335,26 @@ def parse_block(tree: TreeViewNode, graph: CFG, before: Block, label: str = None
         graph.add_edge(before, begin_id, label) 
     statement_id = begin_id
     for i in tree.children[1:-2]:
-        statement_id = parse_statement(i, graph, statement_id, None, end_cycle)
+        statement_id = yield parse_statement(i, graph, statement_id, EdgeKind.FALLTHROUGH, end_cycle)
     graph.add_edge(statement_id, end_id) # Подсоединили предыдущий к концу
     return end_id
 
-def collect_call_names(node: TreeViewNode, cfg: CFG) -> None:
-    if node is None:
-        return
-
-    label = node.label
-    if isinstance(label, str) and label.startswith('call(') and label.endswith(')'):
-        func_name = label[5:-1]  # внутри скобок
-        if func_name not in cfg.call_names:
-            cfg.call_names.add(func_name)
+def collect_call_names(node: IRNode, cfg: CFG) -> None:
+    stack = [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        if node.op is Op.CALL:
+            cfg.call_names.add(node.name)
+        stack.extend(node.children)
 
-    for child in getattr(node, "children", []) or []:
-        collect_call_names(child, cfg)
-
-def parse_expression(tree: TreeViewNode, graph: CFG, before: Block, label: str = None):
+def parse_expression(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH):
     try:
         if tree.label == 'expr':
             updated_tree = parse_expr(tree)
         else:
             updated_tree = parse_expr(tree.children[0])
         collect_call_names(updated_tree, graph)
-        expr_id = graph.new_block(tree_view_to_str(updated_tree), updated_tree)
+        expr_id = graph.new_block(tree=updated_tree)
     except ValueError as e:
         error_msg = str(e)
         graph.errors.append(error_msg)
@@ -137,7 +364,7 @@ def parse_expression(tree: TreeViewNode, graph: CFG, before: Block, label: str =
     return expr_id
 
 
-def parse_if(tree: TreeViewNode, graph: CFG, before: Block, label: str = None, end_cycle: Block = None):
+def parse_if(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH, end_cycle: Block = None):
     """
     [0] 'if'
     [1] expr
@@ -148,17 +375,17 @@ def parse_if(tree: TreeViewNode, graph: CFG, before: Block, label: str = None, e
     [5] statement
     """
     expr_id = parse_expression(tree.children[1], graph, before, label)
-    statement_id = parse_statement(tree.children[3], graph, expr_id, 'True', end_cycle)
+    statement_id = yield parse_statement(tree.children[3], graph, expr_id, EdgeKind.TRUE, end_cycle)
     end_if = graph.new_block('end_if')
     graph.add_edge(statement_id, end_if)
     if len(tree.children) == 4:
-        graph.add_edge(expr_id, end_if, 'False') # End if
+        graph.add_edge(expr_id, end_if, EdgeKind.FALSE) # End if
     else:
-        statement_id = parse_statement(tree.children[5], graph, expr_id, 'False', end_cycle)
+        statement_id = yield parse_statement(tree.children[5], graph, expr_id, EdgeKind.FALSE, end_cycle)
         graph.add_edge(statement_id, end_if) # End if
     return end_if
     
-def parse_while(tree: TreeViewNode, graph: CFG, before: Block, label: str = None):
+def parse_while(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH):
     """
     [0] 'while'
     [1] expr
@@ -168,13 +395,13 @@ def parse_while(tree: TreeViewNode, graph: CFG, before: Block, label: str = None
     """
     expr_id = parse_expression(tree.children[1], graph, before, label)
     end_while = graph.new_block('end_while')
-    statement_id = parse_statement(tree.children[3], graph, expr_id, 'True', end_while)
+    statement_id = yield parse_statement(tree.children[3], graph, expr_id, EdgeKind.TRUE, end_while)
     
     graph.add_edge(statement_id, expr_id) 
-    graph.add_edge(expr_id, end_while, 'false') 
+    graph.add_edge(expr_id, end_while, EdgeKind.FALSE)
     return end_while
 
-def parse_do(tree: TreeViewNode, graph: CFG, before: Block, label: str = None):
+def parse_do(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH):
     """
     [0] 'repeat'
     [1] statement
@@ -184,15 +411,16 @@ def parse_do(tree: TreeViewNode, graph: CFG, before: Block, label: str = None):
     """
     start_repeat = graph.new_block('start_repeat')
     end_repeat = graph.new_block('end_repeat')
-    statement_id = parse_statement(tree.children[1], graph, start_repeat, label, end_repeat)
+    statement_id = yield parse_statement(tree.children[1], graph, start_repeat, EdgeKind.FALLTHROUGH, end_repeat)
     expr_id = parse_expression(tree.children[3], graph, statement_id)
     
-    graph.add_edge(before, start_repeat) 
-    graph.add_edge(expr_id, start_repeat, 'true' if tree.children[2].label == '"while"' else 'false') 
-    graph.add_edge(expr_id, end_repeat, 'true' if tree.children[2].label != '"while"' else 'false') 
+    repeat_while = tree.children[2].label == '"while"'
+    graph.add_edge(before, start_repeat, label)
+    graph.add_edge(expr_id, start_repeat, EdgeKind.TRUE if repeat_while else EdgeKind.FALSE)
+    graph.add_edge(expr_id, end_repeat, EdgeKind.FALSE if repeat_while else EdgeKind.TRUE)
     return end_repeat
 
-def parse_break(tree: TreeViewNode, graph: CFG, before: Block, label: str = None, end_cycle: Block = None):
+def parse_break(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH, end_cycle: Block = None):
     break_id = graph.new_block('break')
     graph.add_edge(break_id, end_cycle)
     graph.add_edge(before, break_id, label)
@@ -200,37 +428,41 @@ def parse_break(tree: TreeViewNode, graph: CFG, before: Block, label: str = None
         raise SyntaxError(f"Error: break without cycle at {tree.node.end_point}")
     return None
     
-def parse_statement(tree: TreeViewNode, graph: CFG, before: Block, label: str = None, end_cycle: Block = None):
+def parse_statement(tree: TreeViewNode, graph: CFG, before: Block, label: EdgeKind = EdgeKind.FALLTHROUGH, end_cycle: Block = None):
     tree = tree.children[0]
     match tree.label:
         case 'block':
-            return parse_block(tree, graph, before, label, end_cycle)
+            return (yield parse_block(tree, graph, before, label, end_cycle))
         case 'expression':
             return parse_expression(tree, graph, before, label)
         case 'if':
-            return parse_if(tree, graph, before, label, end_cycle)
+            return (yield parse_if(tree, graph, before, label, end_cycle))
         case 'while':
-            return parse_while(tree, graph, before, label)
+            return (yield parse_while(tree, graph, before, label))
         case 'do':
-            return parse_do(tree, graph, before, label)
+            return (yield parse_do(tree, graph, before, label))
         case 'break':
             return parse_break(tree, graph, before, label, end_cycle)
         case _:
-            print(tree.label)
-            raise "Такого блока нет"
+            raise SyntaxError(f"Error: unknown statement {tree.label}")
 
 def build_graph(tree: TreeViewNode) -> Tuple[CFG, List[str]]:
     cfg = CFG()
-    body = tree.children[0].children[-1]
-    if body.label != 'body':
+    if not has_body(tree):
         return None, None, None
-    parse_block(body.children[-1], cfg, None)
+    body = tree.children[0].children[-1]
+    run_task(parse_block(body.children[-1], cfg, None))
     return cfg, cfg.call_names, cfg.errors
 
 
 def get_func_name(tree: TreeViewNode):
     return tree.children[0].children[1].children[0].children[0].label
 
+
+def has_body(tree: TreeViewNode) -> bool:
+    """Есть ли у функции тело (иначе это только объявление сигнатуры)."""
+    return tree.children[0].children[-1].label == 'body'
+
 #######################################################################
 # RENDER
 #######################################################################
@@ -251,22 +483,20 @@ def cfg_to_graphviz(cfg: CFG,
     for block in cfg.blocks.values():
         # Можно добавить id в label, чтобы проще ориентироваться
         node_label = f"{block.label}"
-        if block.tree is not None:
+        if block.trees:
             lines = str(block.label).splitlines()
-            node_label = ""
-            for line in lines:
-                node_label += line + "\\l" 
+            node_label = "".join(line + "\\l" for line in lines)
         dot.node(str(block.id), label=node_label)
 
     # Затем добавляем рёбра
     for block in cfg.blocks.values():
-        for succ_id, edge_label in block.succs:
+        for succ_id, kind in block.succs:
             # На всякий случай проверим, что целевой блок существует
             if succ_id not in cfg.blocks:
                 continue  # либо raise ValueError(...)
             edge_kwargs = {}
-            if edge_label is not None:
-                edge_kwargs["label"] = edge_label
+            if kind is not EdgeKind.FALLTHROUGH:
+                edge_kwargs["label"] = kind.value
             dot.edge(str(block.id), str(succ_id), **edge_kwargs)
 
     return dot
@@ -0,0 +1,99 @@
+"""
+Промежуточное представление (IR) выражений.
+
+ast_generator строит дерево IRNode один раз; проверка типов и генерация
+кода разбирают узел по коду операции (op) и полям операндов, а не по
+строке. Строковая метка (load(x), const(dec(1)), ...) собирается только
+для отображения: в графах, дампах и сообщениях об ошибках.
+
+IRNode — наследник TreeViewNode, поэтому label/children/type и печать
+деревьев работают как раньше.
+"""
+
+from enum import Enum
+
+from tree_parser import EMPTY_CHILDREN, TreeViewNode
+
+
+class Op(Enum):
+    CONST = "const"            # lit_type, value
+    LOAD = "load"              # name
+    LOAD_ARRAY = "load_array"  # name (ссылка на массив, load(a[]))
+    STORE = "store"            # name; дети: [значение]
+    STORE_AT = "store_at"      # name; дети: [индексы..., значение]
+    CALL = "call"              # name; дети: аргументы
+    INDEX = "index"            # дети: [база, индекс]
+    BINARY = "binary"          # operator; дети: [левый, правый]
+    UNARY = "unary"            # operator; дети: [операнд]
+
+
+STORE_OPS = frozenset((Op.STORE, Op.STORE_AT))
+
+
+class IRNode(TreeViewNode):
+    """
+    Узел IR.
+
+    op        — код операции (Op)
+    name      — имя переменной, массива или функции
+    operator  — знак операции для BINARY/UNARY ('+', '<=', '!', ...)
+    lit_type  — вид литерала для CONST ('dec', 'hex', 'str', ...)
+    value     — текст литерала для CONST
+    has_store — в поддереве (включая сам узел) есть STORE/STORE_AT;
+                считается при создании из флагов детей, поэтому проверка
+                вложенных присваиваний не обходит поддерево заново
+    """
+
+    __slots__ = ("op", "name", "operator", "lit_type", "value", "has_store")
+
+    def __init__(
+        self,
+        op: Op,
+        children=EMPTY_CHILDREN,
+        *,
+        name: str | None = None,
+        operator: str | None = None,
+        lit_type: str | None = None,
+        value: str | None = None,
+    ):
+        super().__init__(label=None, node=None, children=children)
+        self.op = op
+        self.name = name
+        self.operator = operator
+        self.lit_type = lit_type
+        self.value = value
+        self.has_store = op in STORE_OPS or any(
+            child.has_store for child in children
+        )
+
+    @property
+    def label(self) -> str:
+        if self._label is None:
+            self._label = ir_label(self)
+        return self._label
+
+    @property
+    def text(self) -> str:
+        return self.label
+
+
+def ir_label(node: IRNode) -> str:
+    """Строковая метка узла для отображения."""
+    match node.op:
+        case Op.CONST:
+            return f"const({node.lit_type}({node.value}))"
+        case Op.LOAD:
+            return f"load({node.name})"
+        case Op.LOAD_ARRAY:
+            return f"load({node.name}[])"
+        case Op.STORE:
+            return f"store({node.name})"
+        case Op.STORE_AT:
+            return f"store_at({node.name})"
+        case Op.CALL:
+            return f"call({node.name})"
+        case Op.INDEX:
+            return "index"
+        case Op.BINARY | Op.UNARY:
+            return node.operator
+    raise ValueError(f"Неизвестная операция IR: {node.op}")
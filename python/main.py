@@ -5,6 +5,8 @@ from file_parser_to_graph import (
     write_errors_report,
 )
 from generate_asm import generate_asm
+from get_parse_tree import ParserSession
+from watch import WatchCompiler
 from types_generator import process_type, check_main_function
 from type_checker import render_all_typed_cfgs
 from pathlib import Path
@@ -41,9 +43,20 @@ def handle_type_check(result, out_dir_path: Path) -> tuple[bool, dict, dict]:
     return False, typed_data, funcs_returns  # Ошибок нет, продолжаем трансляцию
 
 
-def main():
-    grammar_dir, lang_name, file_paths, out_dir, lib_path = parse_cli()
-    result = analyze_files(file_paths, lib_path, lang_name, grammar_dir, out_dir=out_dir)
+def compile_program(
+    session, file_paths, out_dir, jobs: int = 1, tree_format: str = "text", tree_cache_dir=None
+) -> str:
+    """
+    Полная трансляция одной программы (набора файлов) в out_dir.
+
+    Возвращает статус: "ok", "errors" (ошибки разбора/графов),
+    "type_errors", "no_main" или "no_typed_data".
+    """
+    result = analyze_files(
+        file_paths, session.lib_path, session.lang_name, session.grammar_dir,
+        out_dir=out_dir, session=session, jobs=jobs, tree_format=tree_format,
+        tree_cache_dir=tree_cache_dir,
+    )
     
     out_dir_path = Path(out_dir)
     out_dir_path.mkdir(parents=True, exist_ok=True)
@@ -54,21 +67,21 @@ def main():
     ready_assemble = write_errors_report(result, filename=str(errors_report_path))
     
     if ready_assemble:
-        return
+        return "errors"
 
     # Проверка типов: если есть ошибки, останавливаем трансляцию
     has_errors, typed_data, funcs_returns = handle_type_check(result, out_dir_path)
     if has_errors:
-        return
+        return "type_errors"
     
     # Проверка наличия функции main без аргументов и без возвращаемого значения
     if not check_main_function(result, errors_report_path):
-        return
+        return "no_main"
     
     # Проверяем, что typed_data не None перед использованием
     if typed_data is None:
         print("Ошибка: typed_data равен None")
-        return
+        return "no_typed_data"
     
     asm_file = out_dir_path / "result.asm"
     
@@ -76,7 +89,35 @@ def main():
     generate_asm(typed_data, str(asm_file), funcs_returns)
     print(f"Ассемблерный код сохранен в {asm_file}")
 
-    return
+    return "ok"
+
+
+def main():
+    grammar_dir, lang_name, file_paths, out_dir, lib_path, options = parse_cli()
+    session = ParserSession(lib_path, lang_name, grammar_dir)
+
+    if options.batch:
+        # batch импортирует main, поэтому импорт здесь
+        from batch import run_batch
+        ok = run_batch(
+            session, options.batch, jobs=options.jobs,
+            tree_format=options.tree_format, tree_cache_dir=options.tree_cache,
+        )
+        raise SystemExit(0 if ok else 1)
+
+    if options.watch:
+        WatchCompiler(
+            session, file_paths, out_dir,
+            tree_format=options.tree_format, tree_cache_dir=options.tree_cache,
+        ).watch(options.interval)
+        return
+
+    compile_program(
+        session, file_paths, out_dir, jobs=options.jobs,
+        tree_format=options.tree_format, tree_cache_dir=options.tree_cache,
+    )
+    if session.loader is not None:
+        print(f"Язык {lang_name} загружен через {session.loader}")
 
 if __name__ == "__main__":
     main()
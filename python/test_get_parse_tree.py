@@ -0,0 +1,75 @@
+"""
+Выбор загрузчика языка в ParserSession и режим --binding в parse_cli.
+"""
+
+import sys
+import types
+from ctypes import CDLL, PYFUNCTYPE, c_char_p, c_void_p, py_object, pythonapi
+
+import pytest
+
+from file_parser_to_graph import parse_cli
+from get_parse_tree import ParserSession
+
+
+@pytest.fixture
+def var2_binding(var2_lib, monkeypatch):
+    """
+    Пакет tree_sitter_var2 в sys.modules: language() возвращает капсулу
+    tree_sitter.Language, как _binding, собранный tree-sitter/setup.py.
+    """
+    lib = CDLL(var2_lib)
+    lib.tree_sitter_var2.restype = c_void_p
+    capsule_new = PYFUNCTYPE(py_object, c_void_p, c_char_p, c_void_p)(
+        ("PyCapsule_New", pythonapi)
+    )
+    module = types.ModuleType("tree_sitter_var2")
+    module.language = lambda: capsule_new(
+        lib.tree_sitter_var2(), b"tree_sitter.Language", None
+    )
+    monkeypatch.setitem(sys.modules, "tree_sitter_var2", module)
+    return module
+
+
+def test_binding_used_without_library(var2_binding, example_path):
+    session = ParserSession(None, "var2")
+    root = session.parse(example_path("06_while"))
+    assert session.loader == "binding"
+    assert not root.has_error
+
+
+def test_explicit_library_wins_over_binding(var2_binding, var2_lib):
+    session = ParserSession(var2_lib, "var2")
+    session.language
+    assert session.loader == "ctypes"
+
+
+def test_no_binding_and_no_library(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tree_sitter_var2", None)
+    with pytest.raises(FileNotFoundError):
+        ParserSession(None, "var2").language
+
+
+def test_cli_binding_mode(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["main.py", "--binding", "var2", "a", "b", "out"])
+    grammar_dir, lang_name, file_paths, out_dir, lib_path, _ = parse_cli()
+    assert (grammar_dir, lang_name, lib_path) == (None, "var2", None)
+    assert (file_paths, out_dir) == (["a", "b"], "out")
+
+    monkeypatch.setattr(sys, "argv", ["main.py", "--binding", "var2", "--batch", "m.json"])
+    assert parse_cli()[4] is None
+
+    monkeypatch.setattr(sys, "argv", ["main.py", "lib/libvar2.so", "a", "out"])
+    _, lang_name, file_paths, out_dir, lib_path, _ = parse_cli()
+    assert (lang_name, lib_path, file_paths, out_dir) == ("var2", "lib/libvar2.so", ["a"], "out")
+
+
+@pytest.mark.parametrize("argv", [
+    ["a", "out"],
+    ["--binding", "var2", "--lib", "var2", "a", "out"],
+])
+def test_cli_rejects_ambiguous_language(monkeypatch, argv):
+    # ["a", "out"]: без --binding первый аргумент — библиотека, и входных файлов нет
+    monkeypatch.setattr(sys, "argv", ["main.py", *argv])
+    with pytest.raises(SystemExit):
+        parse_cli()
@@ -0,0 +1,48 @@
+"""
+coalesce_blocks: после сборки базовых блоков у функций с ветвлениями и
+циклами не остаётся пустых блоков-меток, а ветки, ведущие в конец
+функции, переходят прямо на .out.
+"""
+
+import pytest
+
+from file_parser_to_graph import build_function
+from generate_asm import func_to_asm
+from graph_parser import EdgeKind, get_func_name
+from test_tree_serializer import parsed_view
+
+
+def built_functions(session, path):
+    for node in parsed_view(session, path).children:
+        name = get_func_name(node).strip().strip('"')
+        built = build_function(node, name, path)
+        if built["cfg"] is not None:
+            yield name, built
+
+
+@pytest.mark.parametrize("name", ["04_if", "06_while", "07_do", "11_break"])
+def test_no_marker_blocks_left(session, example_path, name):
+    for func_name, built in built_functions(session, example_path(name)):
+        cfg = built["cfg"]
+        assert 0 in cfg.blocks
+        for block in cfg.blocks.values():
+            assert block.trees, (func_name, block.id, block.label)
+            kinds = sorted(kind.name for _, kind in block.succs)
+            assert kinds in ([], ["FALLTHROUGH"], ["TRUE"], ["FALSE"], ["FALSE", "TRUE"])
+
+        asm = func_to_asm(func_name, cfg, None, built["params"], built["vars"])
+        lines = asm.splitlines()
+        for label, jump in zip(lines, lines[1:]):
+            # Ни один блок не состоит из одного перехода
+            assert not (label.startswith(".id") and jump.strip().startswith("jmp")), asm
+
+
+def test_loop_exit_jumps_to_out(session, example_path):
+    built = dict(built_functions(session, example_path("06_while")))["test_while"]
+    cfg = built["cfg"]
+    # Условие цикла стало входом функции, а его ветка False — выходом
+    entry = cfg.blocks[0]
+    assert [kind for _, kind in entry.succs] == [EdgeKind.TRUE]
+    assert entry.exits
+    asm = func_to_asm("test_while", cfg, None, built["params"], built["vars"])
+    assert "    jmp .out\n.id" in asm
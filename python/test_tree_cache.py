@@ -0,0 +1,78 @@
+"""
+TreeCache: попадание для неизменённого файла, промах при смене версии
+формата, версии построения дерева или грамматики, и разбор заново, если
+запись в кэше обрезана или испорчена.
+"""
+
+import pytest
+
+import tree_cache
+from file_parser_to_graph import load_view
+from get_parse_tree import open_source
+from test_tree_serializer import assert_same_tree, parsed_view
+from tree_cache import TreeCache
+
+
+def cached_path(cache: TreeCache, path):
+    return cache._path(cache.key(open_source(path)))
+
+
+def test_hit_for_unchanged_file(session, example_path, tmp_path, monkeypatch):
+    path = example_path("06_while")
+    cache = TreeCache(tmp_path, session)
+
+    first, errors = load_view(session, path, cache)
+    assert not errors
+    assert cached_path(cache, path).exists()
+
+    # Второй раз файл не разбирается: дерево приходит из кэша
+    def parse_bytes(data):
+        raise AssertionError("файл из кэша не должен разбираться")
+
+    monkeypatch.setattr(session, "parse_bytes", parse_bytes)
+    second, errors = load_view(session, path, cache)
+    assert not errors
+    assert_same_tree(first, second)
+
+
+@pytest.mark.parametrize("what", ["FORMAT_VERSION", "VIEW_VERSION", "grammar"])
+def test_miss_when_version_or_grammar_changes(session, example_path, tmp_path,
+                                             monkeypatch, what):
+    path = example_path("06_while")
+    data = open_source(path)
+    cache = TreeCache(tmp_path, session)
+    key = cache.key(data)
+    cache.store(key, parsed_view(session, path))
+    assert cache.load(key) is not None
+
+    if what == "grammar":
+        monkeypatch.setattr(session, "_fingerprint", "0" * 16)
+    else:
+        monkeypatch.setattr(tree_cache, what, getattr(tree_cache, what) + 1)
+
+    changed = TreeCache(tmp_path, session)
+    assert changed.key(data) != key
+    assert changed.load(changed.key(data)) is None
+
+
+@pytest.mark.parametrize("damage", ["truncate", "garbage", "empty"])
+def test_corrupt_entry_is_parsed_again(session, example_path, tmp_path, damage):
+    path = example_path("06_while")
+    cache = TreeCache(tmp_path, session)
+    expected, _ = load_view(session, path, cache)
+
+    entry = cached_path(cache, path)
+    data = entry.read_bytes()
+    if damage == "truncate":
+        entry.write_bytes(data[:len(data) // 2])
+    elif damage == "garbage":
+        entry.write_bytes(data[:12] + bytes(range(256)) * (len(data) // 256 + 1))
+    else:
+        entry.write_bytes(b"")
+
+    assert cache.load(cache.key(open_source(path))) is None
+    view_root, errors = load_view(session, path, cache)
+    assert not errors
+    assert_same_tree(expected, view_root)
+    # Испорченная запись заменена свежей
+    assert entry.read_bytes() == data
@@ -0,0 +1,38 @@
+"""
+WatchCompiler пишет дампы деревьев в выбранном формате и берёт деревья
+неизменённых файлов из TreeCache.
+"""
+
+import graphviz
+import pytest
+
+import watch
+from watch import WatchCompiler
+
+
+@pytest.fixture(autouse=True)
+def no_graphviz(monkeypatch):
+    # Для тестов нужен только исходный текст графов, не сам dot
+    monkeypatch.setattr(graphviz.Digraph, "render", lambda self, *args, **kwargs: None)
+
+
+def test_binary_dumps_and_tree_cache(session, example_path, tmp_path, monkeypatch):
+    files = [example_path("12_recursion")]
+    first = WatchCompiler(session, files, tmp_path / "a", "binary", tmp_path / "cache")
+    assert first.run_once()
+    assert (tmp_path / "a" / "tree" / "12_recursion.tvb").exists()
+    assert not (tmp_path / "a" / "tree" / "12_recursion").exists()
+
+    def reparse(*args, **kwargs):
+        raise AssertionError("файл из кэша не должен разбираться")
+
+    monkeypatch.setattr(session, "reparse", reparse)
+    second = WatchCompiler(session, files, tmp_path / "b", "binary", tmp_path / "cache")
+    assert second.run_once()
+    assert (tmp_path / "b" / "result.asm").read_text() == (tmp_path / "a" / "result.asm").read_text()
+    # Повторный раунд без изменений: функции из дерева кэша не пересобираются
+    def build_function(*args):
+        raise AssertionError("неизменённая функция не должна строиться заново")
+
+    monkeypatch.setattr(watch, "build_function", build_function)
+    assert second.run_once()
@@ -0,0 +1,57 @@
+"""
+Кэш деревьев TreeViewNode на диске, адресуемый содержимым.
+
+Ключ — sha256 от текста файла, отпечатка грамматики
+(ParserSession.grammar_fingerprint), версии построения дерева
+(tree_parser.VIEW_VERSION) и версии двоичного формата
+(tree_serializer.FORMAT_VERSION). Неизменённый файл загружает готовое
+дерево вместо разбора и build_tree_view. Кэшируются только деревья без
+синтаксических ошибок.
+
+Раскладка: <cache_dir>/<первые 2 символа ключа>/<ключ>.tvb
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+from tree_parser import VIEW_VERSION, TreeViewNode
+from tree_serializer import FORMAT_VERSION, dumps_tree_view, loads_tree_view
+
+
+class TreeCache:
+    def __init__(self, cache_dir, session):
+        self.cache_dir = Path(cache_dir)
+        self.session = session
+        self._salt = None
+
+    def key(self, data) -> str:
+        """Ключ для исходника data (bytes или буфер)."""
+        if self._salt is None:
+            self._salt = (
+                f"view={VIEW_VERSION} format={FORMAT_VERSION} "
+                f"grammar={self.session.grammar_fingerprint}\n"
+            ).encode()
+        h = hashlib.sha256(self._salt)
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.tvb"
+
+    def load(self, key: str) -> TreeViewNode | None:
+        """Дерево по ключу key() или None, если в кэше его нет."""
+        try:
+            with self._path(key).open("rb") as f:
+                return loads_tree_view(f.read())
+        except (OSError, ValueError):
+            # нет записи или она испорчена — просто строим заново
+            return None
+
+    def store(self, key: str, view_root: TreeViewNode) -> None:
+        """Сохраняет дерево по ключу key() (запись атомарная)."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(dumps_tree_view(view_root))
+        os.replace(tmp_path, path)
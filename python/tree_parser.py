@@ -1,23 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, List, TextIO
+from typing import Any, Sequence, TextIO
+import gzip
 import sys
 from pathlib import Path
-import io
 
 
-def field_name_of(node):
-    p = node.parent
-    if p is None:
-        return node.type
-    for i in range(p.child_count):
-        if p.child(i) == node and p.field_name_for_child(i):
-            return p.field_name_for_child(i)
-    return node.type
-
-
-@dataclass
 class TreeViewNode:
     """
     Узел логического дерева, соответствующий тому, что раньше выводилось в файл.
@@ -26,12 +14,125 @@ class TreeViewNode:
     node   — исходный node из парсера (для "настоящих" узлов); для синтетических узлов (empty) — None.
     children — потомки в отображаемом дереве.
     type   — тип данных узла (заполняется при типизации).
+    text   — исходный текст листа без кавычек ("x" -> x).
+
+    Узлы без __dict__ (slots): их сотни тысяч на программу. У листьев
+    children — общий пустой кортеж EMPTY_CHILDREN, а у остальных узлов
+    готового дерева — кортеж точного размера, а не список с запасом.
+    Хранится только label: text выводится из него при обращении, а сами
+    метки интернированы, поэтому одинаковые метки — одна строка на всё дерево.
+
+    Листья с текстом исходника (TreeViewNode.leaf) ничего не декодируют
+    при построении: текст берётся из node по его смещениям только при
+    первом обращении к text или label.
+    """
+
+    __slots__ = ("_label", "node", "children", "type")
+
+    def __init__(
+        self,
+        label: str | None,
+        node: Any | None,
+        children: Sequence["TreeViewNode"],
+        type: str | None = None,
+    ):
+        self._label = label
+        self.node = node
+        self.children = children
+        self.type = type
+
+    @classmethod
+    def leaf(cls, node) -> "TreeViewNode":
+        """Лист '"<текст node>"', текст которого декодируется лениво."""
+        return cls(label=None, node=node, children=EMPTY_CHILDREN)
+
+    @property
+    def text(self) -> str:
+        label = self._label
+        if label is None:
+            raw = self.node.text
+            text = (
+                raw.decode("utf-8")
+                if isinstance(raw, (bytes, bytearray))
+                else str(raw)
+            )
+            self._label = sys.intern(f'"{text}"')
+            return text
+        if len(label) >= 2 and label[0] == label[-1] == '"':
+            return label[1:-1]
+        return label
+
+    @property
+    def label(self) -> str:
+        if self._label is None:
+            self.text
+        return self._label
+
+    @label.setter
+    def label(self, value: str) -> None:
+        self._label = value
+
+    def __repr__(self) -> str:
+        return (
+            f"TreeViewNode(label={self.label!r}, node={self.node!r}, "
+            f"children={self.children!r}, type={self.type!r})"
+        )
+
+
+# Общие (неизменяемые) дети всех листьев
+EMPTY_CHILDREN: tuple = ()
+
+# Версия построения дерева: увеличивать при любом изменении того, какое
+# дерево строит build_tree_view (сохранённые деревья в кэше станут чужими)
+VIEW_VERSION = 1
+
+
+def detach_parser_nodes(root: TreeViewNode) -> None:
+    """
+    Заменяет узлы tree-sitter во всём дереве на SavedNode (как в дереве из
+    кэша: только позиция конца для сообщений об ошибках), чтобы дерево
+    можно было передать в другой процесс (pickle) и строить по нему CFG.
+    Ленивые листья перед этим получают свой текст.
+    """
+    # tree_serializer импортирует TreeViewNode, поэтому импорт здесь
+    from tree_serializer import SavedNode
+
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        if n.node is not None:
+            if n._label is None:
+                n.text  # декодируем, пока node ещё есть
+            row, column = n.node.end_point
+            n.node = SavedNode(row, column)
+        stack.extend(n.children)
+
+
+def collect_syntax_errors(root) -> list[str]:
     """
+    Сообщения о пропущенных (missing) и ошибочных (ERROR) узлах дерева
+    разбора в порядке обхода. Дерево TreeViewNode для этого не нужно.
 
-    label: str
-    node: Any | None
-    children: List["TreeViewNode"]
-    type: str | None = None
+    has_error выставлен у узла, если ошибка есть где-то в его поддереве
+    (пропущенные узлы тоже считаются ошибкой), поэтому для корректного
+    файла проверка стоит одного обращения, а при ошибках обходятся только
+    поддеревья с has_error.
+    """
+    errors: list[str] = []
+    if not root.has_error:
+        return errors
+
+    stack = [root]
+    while stack:
+        n = stack.pop()
+        if n.is_missing:
+            errors.append(
+                f'Error: missing element "{n.type}" in end point {n.end_point}'
+            )
+        if n.is_error:
+            errors.append(f"Error: incorrect in end point {n.end_point}")
+        stack.extend(reversed([ch for ch in n.children if ch.has_error]))
+    return errors
 
 
 def build_tree_view(root) -> tuple[TreeViewNode, list[str]]:
@@ -60,79 +161,129 @@ def build_tree_view(root) -> tuple[TreeViewNode, list[str]]:
         "builtin",
     }
     
-    errors: list[str] = []
-    
-    def _child_anc(anc_has_next: list[bool], is_last: bool) -> list[bool]:
-        return [*anc_has_next, not is_last]
+    # узлы, в которые вставляется пустой список, если его поля нет:
+    # тип узла -> (имя поля, тип токена, после которого вставлять)
+    inject_cfg = {
+        "funcSignature": ("list_argDef", "("),
+        "call_expression": ("listExpr", "("),
+        "indexer": ("listExpr", "["),
+    }
+
+    errors = collect_syntax_errors(root)
 
-    def _build(n, anc_has_next: list[bool], is_last: bool) -> TreeViewNode:
-        fname = field_name_of(n)
+    # Один проход TreeCursor: имя поля узла берётся из cursor.field_name,
+    # без поиска узла среди детей родителя. Открытые (ещё не законченные)
+    # узлы лежат в стеке кадров:
+    # [view, need_field, left_token, need_field_seen, inject_at]
+    cursor = root.walk()
+    stack: list[list] = []
+    result: TreeViewNode | None = None
+
+    while True:
+        n = cursor.node
+        raw_fname = cursor.field_name
+        fname = raw_fname if raw_fname is not None else n.type
         if fname in replace_names:
             fname = replace_names[fname]
+        else:
+            # Парсер отдаёт каждый раз новую строку; меток же всего несколько
+            # десятков видов
+            fname = sys.intern(fname)
 
         is_token = n.type in TOKEN_TYPES
 
-        if getattr(n, "is_missing", False):
-            errors.append(
-                f'Error: missing element "{n.type}" in end point {n.end_point}'
-            )
-        if getattr(n, "is_error", False):
-            errors.append(f"Error: incorrect in end point {n.end_point}")
-
-        if len(n.children) == 0:
-            text = (
-                n.text.decode("utf-8")
-                if isinstance(n.text, (bytes, bytearray))
-                else str(n.text)
-            )
-
+        is_leaf = n.child_count == 0
+        if is_leaf:
             if is_token:
-                parent = TreeViewNode(label=fname, node=n, children=[])
-                parent.children.append(
-                    TreeViewNode(label=f'"{text}"', node=n, children=[])
+                view = TreeViewNode(
+                    label=fname, node=n, children=(TreeViewNode.leaf(n),)
                 )
-                return parent
-
-            if not anc_has_next:
-                label = fname
+            elif not stack:
+                view = TreeViewNode(label=fname, node=n, children=EMPTY_CHILDREN)
             else:
-                label = f'"{text}"'
-
-            return TreeViewNode(label=label, node=n, children=[])
-
-        label = fname
-        children_view: list[TreeViewNode] = []
-
-        child_anc = _child_anc(anc_has_next, is_last)
-
-        inject_cfg = {
-            "funcSignature": ("list_argDef", "("),
-            "call_expression": ("listExpr", "("),
-            "indexer": ("listExpr", "["),
-        }
-
-        need_field, left_token = inject_cfg.get(n.type, (None, None))
-        present_fields = {n.field_name_for_child(i) for i in range(n.child_count)} - {
-            None
-        }
-        should_inject = bool(need_field) and (need_field not in present_fields)
-        injected = False
-
-        for i, ch in enumerate(n.children):
-            ch_is_last = i == len(n.children) - 1
-            child_view = _build(ch, child_anc, ch_is_last)
-            children_view.append(child_view)
-
-            if should_inject and not injected and ch.type == left_token:
+                view = TreeViewNode.leaf(n)
+        else:
+            view = TreeViewNode(label=fname, node=n, children=[])
+
+        if stack:
+            frame = stack[-1]
+            frame[0].children.append(view)
+            if raw_fname is not None and raw_fname == frame[1]:
+                frame[3] = True
+            if frame[4] is None and n.type == frame[2]:
+                frame[4] = len(frame[0].children)
+        else:
+            result = view
+
+        if not is_leaf:
+            need_field, left_token = inject_cfg.get(n.type, (None, None))
+            stack.append([view, need_field, left_token, False, None])
+            cursor.goto_first_child()
+            continue
+
+        # Поднимаемся, пока у узла нет следующего соседа, закрывая кадры
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                result.children = tuple(result.children)
+                return result, errors
+            view, need_field, _, need_field_seen, inject_at = stack.pop()
+            if need_field and not need_field_seen and inject_at is not None:
                 display = replace_names.get(need_field, need_field)
-                children_view.append(
-                    TreeViewNode(label=f"{display}", node=None, children=[])
+                view.children.insert(
+                    inject_at, TreeViewNode(label=f"{display}", node=None, children=EMPTY_CHILDREN)
                 )
-                injected = True
+            # Закрытый узел больше не растёт: кортеж точного размера вместо
+            # списка с запасом под добавление
+            view.children = tuple(view.children)
+
 
-        return TreeViewNode(label=label, node=n, children=children_view)
+def iter_tree_view(root: TreeViewNode, *, ascii: bool = False):
+    """
+    Обходит дерево в прямом порядке без рекурсии и выдаёт пары
+    (префикс строки, узел) — общая часть print_tree_view и печати
+    типизированных деревьев.
+
+    Префикс предков хранится готовой строкой и наращивается на один
+    сегмент при спуске, поэтому глубокие деревья печатаются за линейное
+    время и не упираются в лимит рекурсии.
+    """
+    VBAR, SPACE, TEE, ELBOW = (
+        ("|   ", "    ", "|-- ", "`-- ") if ascii else ("│   ", "    ", "├── ", "└── ")
+    )
 
-    return _build(root, [], True), errors
+    yield "", root
+    # (узел, префикс предков для его детей)
+    stack = [(root, SPACE)] if root.children else []
+    # индексы следующего ребёнка для каждого уровня стека
+    next_child = [0] if root.children else []
+
+    while stack:
+        node, base = stack[-1]
+        i = next_child[-1]
+        children = node.children
+        if i == len(children):
+            stack.pop()
+            next_child.pop()
+            continue
+        next_child[-1] = i + 1
+
+        ch = children[i]
+        is_last = i == len(children) - 1
+        yield base + (ELBOW if is_last else TEE), ch
+        if ch.children:
+            stack.append((ch, base + (SPACE if is_last else VBAR)))
+            next_child.append(0)
+
+
+# Сколько строк дерева копится перед одной записью в поток
+WRITE_CHUNK_LINES = 4096
+
+# Форматы дампа дерева: имя -> суффикс файла
+TREE_DUMP_FORMATS = {
+    "text": "",
+    "gzip": ".gz",
+    "binary": ".tvb",
+}
 
 
 def print_tree_view(
@@ -145,27 +296,19 @@ def print_tree_view(
     Рисует дерево TreeViewNode в поток `out`.
     По умолчанию выводит в консоль (sys.stdout).
     Можно передать файл или любой другой текстовый поток.
-    """
-    VBAR, SPACE, TEE, ELBOW = (
-        ("|   ", "    ", "|-- ", "`-- ") if ascii else ("│   ", "    ", "├── ", "└── ")
-    )
-
-    def _prefix(anc_has_next: list[bool], is_last: bool) -> str:
-        if not anc_has_next:
-            return ""
-        base = "".join(VBAR if has_next else SPACE for has_next in anc_has_next)
-        return base + (ELBOW if is_last else TEE)
-
-    def _child_anc(anc_has_next: list[bool], is_last: bool) -> list[bool]:
-        return [*anc_has_next, not is_last]
-
-    def _walk(node: TreeViewNode, anc_has_next: list[bool], is_last: bool) -> None:
-        out.write(_prefix(anc_has_next, is_last) + node.label + "\n")
-        child_anc = _child_anc(anc_has_next, is_last)
-        for i, ch in enumerate(node.children):
-            _walk(ch, child_anc, i == len(node.children) - 1)
 
-    _walk(root, [], True)
+    Строки копятся и пишутся пачками по WRITE_CHUNK_LINES,
+    а не одним out.write на узел.
+    """
+    parts: list[str] = []
+    limit = 3 * WRITE_CHUNK_LINES
+    for prefix, node in iter_tree_view(root, ascii=ascii):
+        parts += (prefix, node.label, "\n")
+        if len(parts) >= limit:
+            out.write("".join(parts))
+            parts.clear()
+    if parts:
+        out.write("".join(parts))
 
 
 def write_tree_view_to_file(
@@ -173,18 +316,50 @@ def write_tree_view_to_file(
     out_path: str | Path,
     *,
     ascii: bool = False,
+    compress: bool = False,
+    binary: bool = False,
 ) -> None:
     """
     Удобная обёртка: принимает дерево и путь к файлу,
     создаёт директории (если нужно) и пишет туда дерево.
+
+    compress — сжать вывод gzip; binary — записать не текстовый рисунок,
+    а компактную двоичную форму (tree_serializer.dumps_tree_view).
     """
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with out_path.open("w", encoding="utf-8") as f:
+    if binary:
+        # tree_serializer импортирует TreeViewNode, поэтому импорт здесь
+        from tree_serializer import dumps_tree_view
+
+        data = dumps_tree_view(root)
+        with (gzip.open(out_path, "wb") if compress else out_path.open("wb")) as f:
+            f.write(data)
+        return
+
+    if compress:
+        f = gzip.open(out_path, "wt", encoding="utf-8")
+    else:
+        f = out_path.open("w", encoding="utf-8")
+    with f:
         print_tree_view(root, ascii=ascii, out=f)
 
 
+def dump_tree_view(root: TreeViewNode, base_path: str | Path, fmt: str = "text") -> Path:
+    """
+    Пишет дамп дерева в одном из TREE_DUMP_FORMATS.
+    К base_path добавляется суффикс формата; возвращает путь файла.
+    """
+    if fmt not in TREE_DUMP_FORMATS:
+        raise ValueError(f"Неизвестный формат дампа дерева: {fmt}")
+    out_path = Path(str(base_path) + TREE_DUMP_FORMATS[fmt])
+    write_tree_view_to_file(
+        root, out_path, compress=fmt == "gzip", binary=fmt == "binary"
+    )
+    return out_path
+
+
 def tree_view_to_str(
     root: TreeViewNode,
     *,
@@ -194,6 +369,7 @@ def tree_view_to_str(
     Возвращает строковое представление дерева TreeViewNode
     в том же формате, что и print_tree_view.
     """
-    buf = io.StringIO()
-    print_tree_view(root, ascii=ascii, out=buf)
-    return buf.getvalue()
+    return "".join([
+        prefix + node.label + "\n"
+        for prefix, node in iter_tree_view(root, ascii=ascii)
+    ])
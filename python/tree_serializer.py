@@ -0,0 +1,191 @@
+"""
+Компактная двоичная форма дерева TreeViewNode.
+
+Формат (все числа — беззнаковые 32-битные little-endian):
+
+    заголовок   b"TVB", версия формата (1 байт), число строк, число узлов
+    строки      длины всех строк, затем их utf-8 байты подряд
+    узлы        по 6 чисел на узел в порядке обхода в ширину:
+                индекс label, индекс type + 1 (0 — типа нет),
+                индекс первого ребёнка, число детей,
+                строка end_point + 1 (0 — узла парсера нет), столбец end_point
+
+Метки и типы хранятся один раз в таблице строк. Благодаря обходу в ширину
+дети каждого узла идут подряд, поэтому у узла хранится только диапазон
+индексов детей. Вместо узла парсера сохраняется только его end_point
+(нужен для сообщений об ошибках); при загрузке node — SavedNode.
+"""
+
+import gc
+import struct
+import sys
+from array import array
+from typing import NamedTuple
+
+from tree_parser import EMPTY_CHILDREN, TreeViewNode
+
+MAGIC = b"TVB"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<3sBII")
+_FIELDS = 6
+# типкод массива для 32-битных чисел
+_U32 = "I" if array("I").itemsize == 4 else "L"
+
+
+class SavedPoint(NamedTuple):
+    """
+    Позиция в файле, печатается как tree_sitter.Point, чтобы сообщения
+    об ошибках не зависели от того, взято дерево из кэша или нет.
+    Сам Point из Python не создаётся: в py-tree-sitter 0.26 каждый такой
+    вызов уменьшает счётчик ссылок типа Point, и он в итоге освобождается.
+    """
+    row: int
+    column: int
+
+    def __repr__(self) -> str:
+        return f"<Point row={self.row}, column={self.column}>"
+
+    __str__ = __repr__
+
+
+class SavedNode:
+    """Замена узла парсера в загруженном дереве: только позиция конца."""
+
+    __slots__ = ("row", "column")
+
+    def __init__(self, row: int, column: int):
+        self.row = row
+        self.column = column
+
+    @property
+    def end_point(self) -> SavedPoint:
+        return SavedPoint(self.row, self.column)
+
+
+def _to_le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(_U32, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(data, offset: int, count: int) -> array:
+    values = array(_U32)
+    values.frombytes(data[offset:offset + 4 * count])
+    if len(values) != count:
+        raise ValueError("Двоичное дерево обрезано")
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def dumps_tree_view(root: TreeViewNode) -> bytes:
+    """Сериализует дерево в bytes."""
+    strings: dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        idx = strings.get(s)
+        if idx is None:
+            idx = strings[s] = len(strings)
+        return idx
+
+    records = array(_U32)
+    order = [root]
+    i = 0
+    while i < len(order):
+        node = order[i]
+        i += 1
+        children = node.children
+        if node.node is not None:
+            row, column = node.node.end_point
+            row += 1
+        else:
+            row = column = 0
+        records.extend((
+            intern(node.label),
+            0 if node.type is None else intern(node.type) + 1,
+            len(order),
+            len(children),
+            row,
+            column,
+        ))
+        order.extend(children)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    lengths = array(_U32, map(len, encoded))
+
+    return b"".join((
+        _HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded), len(order)),
+        _to_le(lengths),
+        *encoded,
+        _to_le(records),
+    ))
+
+
+def loads_tree_view(data) -> TreeViewNode:
+    """
+    Восстанавливает дерево из bytes dumps_tree_view.
+    ValueError — если данные не в этом формате или другой версии.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Двоичное дерево обрезано")
+    magic, version, n_strings, n_nodes = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Это не двоичное дерево TreeViewNode")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"Версия формата дерева {version}, поддерживается {FORMAT_VERSION}"
+        )
+
+    offset = _HEADER.size
+    lengths = _from_le(data, offset, n_strings)
+    offset += 4 * n_strings
+    strings = []
+    for length in lengths:
+        strings.append(bytes(data[offset:offset + length]).decode("utf-8"))
+        offset += length
+
+    records = _from_le(data, offset, _FIELDS * n_nodes)
+    if not n_nodes:
+        raise ValueError("Двоичное дерево без узлов")
+
+    # Создаются сотни тысяч объектов без циклов: сборщик мусора на это
+    # время отключаем, иначе он несколько раз обходит растущее дерево
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        try:
+            nodes = [
+                TreeViewNode(
+                    strings[label],
+                    SavedNode(row - 1, column) if row else None,
+                    EMPTY_CHILDREN,
+                    strings[type_idx - 1] if type_idx else None,
+                )
+                for label, type_idx, row, column in zip(
+                    records[0::_FIELDS], records[1::_FIELDS],
+                    records[4::_FIELDS], records[5::_FIELDS],
+                )
+            ]
+        except IndexError:
+            raise ValueError("Двоичное дерево испорчено: нет строки") from None
+
+        # При обходе в ширину дети узлов идут подряд сразу за корнем:
+        # любой другой диапазон означает испорченные данные
+        expected = 1
+        for node, first, count in zip(
+            nodes, records[2::_FIELDS], records[3::_FIELDS]
+        ):
+            if count:
+                if first != expected:
+                    raise ValueError("Двоичное дерево испорчено: дети не по порядку")
+                node.children = tuple(nodes[first:first + count])
+                expected += count
+        if expected != n_nodes:
+            raise ValueError("Двоичное дерево испорчено: лишние узлы")
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return nodes[0]
@@ -8,7 +8,8 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional, Set
-from tree_parser import TreeViewNode, tree_view_to_str
+from ir import Op
+from tree_parser import TreeViewNode, iter_tree_view, tree_view_to_str
 import re
 
 
@@ -85,67 +86,6 @@ def get_literal_type(lit_type: str) -> str:
     return mapping.get(lit_type, 'unknown')
 
 
-def parse_const_literal(label: str) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Парсит const(type(value)) и возвращает (lit_type, value).
-    
-    Пример: const(dec(123)) -> ('dec', '123')
-    """
-    match = re.match(r'const\((\w+)\((.+)\)\)', label)
-    if match:
-        return match.group(1), match.group(2)
-    return None, None
-
-
-def parse_load_name(label: str) -> Optional[str]:
-    """
-    Парсит load(name) или load(name[]) и возвращает имя переменной.
-    
-    load(x) -> 'x'
-    load(arr[]) -> 'arr[]'
-    """
-    match = re.match(r'load\((.+)\)', label)
-    if match:
-        return match.group(1)
-    return None
-
-
-def parse_store_name(label: str) -> Optional[str]:
-    """
-    Парсит store(name) и возвращает имя переменной.
-    
-    store(x) -> 'x'
-    """
-    match = re.match(r'store\((.+)\)', label)
-    if match:
-        return match.group(1)
-    return None
-
-
-def parse_store_at_name(label: str) -> Optional[str]:
-    """
-    Парсит store_at(name) и возвращает имя массива.
-    
-    store_at(arr) -> 'arr'
-    """
-    match = re.match(r'store_at\((.+)\)', label)
-    if match:
-        return match.group(1)
-    return None
-
-
-def parse_call_name(label: str) -> Optional[str]:
-    """
-    Парсит call(func_name) и возвращает имя функции.
-    
-    call(foo) -> 'foo'
-    """
-    match = re.match(r'call\((.+)\)', label)
-    if match:
-        return match.group(1)
-    return None
-
-
 def get_array_element_type(array_type: str) -> Optional[str]:
     """
     Извлекает тип элемента массива.
@@ -240,6 +180,56 @@ def resolve_type(type_str: Optional[str]) -> Optional[str]:
     return type_str
 
 
+class _SubtreeWrites:
+    """
+    Число записей в кэш типов в каждом поддереве одного дерева.
+
+    Узлы нумеруются в прямом порядке обхода, поддерево — отрезок номеров,
+    записи на отрезке считает дерево Фенвика: и запись, и подсчёт — O(log n).
+    """
+
+    def __init__(self, root: TreeViewNode):
+        order: List[TreeViewNode] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(reversed(node.children))
+
+        sizes: Dict[int, int] = {}
+        for node in reversed(order):
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in node.children)
+
+        # id(node) -> (начало, конец) отрезка поддерева
+        self.span = {
+            id(node): (pos, pos + sizes[id(node)]) for pos, node in enumerate(order)
+        }
+        self.tree = [0] * (len(order) + 1)
+
+    def add(self, node: TreeViewNode):
+        span = self.span.get(id(node))
+        if span is None:
+            return
+        i = span[0] + 1
+        while i < len(self.tree):
+            self.tree[i] += 1
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def count(self, node: TreeViewNode) -> Optional[int]:
+        """Число записей в поддереве node; None — узел не из этого дерева."""
+        span = self.span.get(id(node))
+        if span is None:
+            return None
+        return self._prefix(span[1]) - self._prefix(span[0])
+
+
 class TypeChecker:
     """
     Класс для проверки типов в AST.
@@ -273,6 +263,10 @@ class TypeChecker:
         # Используется для отображения конкретных типов вместо UNTYPED_INT
         self.resolved_types: Dict[int, str] = {}
 
+        # Запоминание вызовов в пределах дерева одного блока (см. _memoized)
+        self._writes: Optional[_SubtreeWrites] = None
+        self._memo: Dict[tuple, tuple] = {}
+
     def set_context(self, func_name: str):
         """Устанавливает контекст текущей функции."""
         self.current_func = func_name
@@ -280,12 +274,67 @@ class TypeChecker:
         self.current_args = self.funcs_calls.get(func_name, {})
         # Очищаем кэш при смене контекста
         self.resolved_types.clear()
+        self._writes = None
+        self._memo.clear()
+
+    #######################################################################
+    # ЯВНЫЙ СТЕК ВЫЗОВОВ
+    #######################################################################
+    #
+    # Выражения бывают очень глубокими (длинные цепочки a + b + c + ...),
+    # поэтому методы обхода — генераторы: вместо вложенного вызова они
+    # отдают (yield) генератор подзадачи и получают её результат обратно.
+    # _run исполняет их на явном стеке, и глубина стека Python не зависит
+    # от глубины дерева.
+
+    @staticmethod
+    def _run(task):
+        stack = [task]
+        value = None
+        while stack:
+            try:
+                subtask = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+            else:
+                stack.append(subtask)
+                value = None
+        return value
+
+    def _memoized(self, key: tuple, node: TreeViewNode, make_task):
+        """
+        Выполняет подзадачу make_task() или возвращает запомненный результат.
+
+        Результат вывода зависит только от кэша типов в поддереве node, а
+        записи в кэш однократны. Поэтому вызов, который сам ничего не
+        записал, при повторе с теми же аргументами даст то же самое, пока
+        в поддереве не появится новая запись. Без этого один и тот же
+        операнд выводится заново на каждом уровне цепочки, и время растёт
+        экспоненциально с её длиной.
+        """
+        writes = self._writes
+        before = writes.count(node) if writes is not None else None
+        if before is None:
+            return (yield make_task())
+
+        cached = self._memo.get(key)
+        if cached is not None and cached[0] == before:
+            return cached[1]
+
+        result = yield make_task()
+        if writes.count(node) == before:
+            self._memo[key] = (before, result)
+        return result
     
     def set_resolved_type(self, node: TreeViewNode, type_str: str):
         """Сохраняет разрешённый тип для узла и записывает в node.type."""
         normalized = normalize_type(type_str)
         if normalized is not None:
-            self.resolved_types[id(node)] = normalized
+            if self.resolved_types.get(id(node)) != normalized:
+                self.resolved_types[id(node)] = normalized
+                if self._writes is not None:
+                    self._writes.add(node)
             # Также записываем в сам узел
             node.type = normalized
     
@@ -300,8 +349,17 @@ class TypeChecker:
         
         Возвращает (type_str, errors).
         """
+        self._writes = _SubtreeWrites(node)
+        self._memo.clear()
+        try:
+            return self._run(self._assign_types(node))
+        finally:
+            self._writes = None
+            self._memo.clear()
+
+    def _assign_types(self, node: TreeViewNode):
         # Выводим тип (это рекурсивно обработает всех потомков)
-        inferred_type, errors = self.infer_type(node)
+        inferred_type, errors = yield self._infer_type(node)
         
         # Проверяем, был ли разрешённый тип (из контекста)
         resolved = self.get_resolved_type(node)
@@ -314,12 +372,12 @@ class TypeChecker:
         # Пропагируем типы к дочерним узлам для правильной обработки вложенных выражений
         # Это особенно важно для бинарных операций, присваиваний и вызовов функций
         final_type = node.type
-        self._propagate_types_to_children(node, final_type)
+        yield self._propagate_types_to_children(node, final_type)
         
         # Рекурсивно присваиваем типы потомкам (если они ещё не обработаны)
         for child in node.children:
             if child.type is None:
-                self._assign_type_to_child(child)
+                yield self._assign_type_to_child(child)
         
         return node.type, errors
     
@@ -332,14 +390,14 @@ class TypeChecker:
             return
         
         # Выводим тип
-        inferred_type, _ = self.infer_type(node)
+        inferred_type, _ = yield self._infer_type(node)
         if inferred_type is not None:
             node.type = resolve_type(inferred_type)
         
         # Рекурсивно для потомков
         for child in node.children:
             if child.type is None:
-                self._assign_type_to_child(child)
+                yield self._assign_type_to_child(child)
     
     def get_variable_type(self, var_name: str) -> Optional[str]:
         """
@@ -392,8 +450,18 @@ class TypeChecker:
         
         Возвращает (type_str, errors).
         """
+        return self._run(self._infer_type(node))
+
+    def _infer_type(self, node: TreeViewNode):
+        type_str, errors = yield self._memoized(
+            ('infer', id(node)), node, lambda: self._infer_node_type(node)
+        )
+        # Список ошибок вызывающий дополняет, запомненный не отдаём
+        return type_str, list(errors)
+
+    def _infer_node_type(self, node: TreeViewNode):
         errors: List[TypeCheckError] = []
-        label = node.label
+        op = node.op
         
         # Проверяем, есть ли уже разрешённый тип в кэше
         resolved = self.get_resolved_type(node)
@@ -401,57 +469,35 @@ class TypeChecker:
             return resolved, errors
         
         # 1. Константа: const(type(value))
-        if label.startswith('const('):
-            lit_type, value = parse_const_literal(label)
-            if lit_type:
-                return normalize_type(get_literal_type(lit_type)), errors
-            errors.append(TypeCheckError(
-                message=f"Не удалось распознать константу: {label}",
-                tree=node,
-                tree_str=tree_view_to_str(node)
-            ))
-            return None, errors
+        if op is Op.CONST:
+            return normalize_type(get_literal_type(node.lit_type)), errors
         
         # 2. Загрузка переменной: load(name) или load(name[])
-        if label.startswith('load('):
-            var_name = parse_load_name(label)
-            if var_name:
-                var_type = self.get_variable_type(var_name)
-                if var_type is None:
-                    errors.append(TypeCheckError(
-                        message=f"Неизвестная переменная: {var_name}",
-                        tree=node,
-                        tree_str=tree_view_to_str(node)
-                    ))
-                return normalize_type(var_type), errors
-            errors.append(TypeCheckError(
-                message=f"Не удалось распознать load: {label}",
-                tree=node,
-                tree_str=tree_view_to_str(node)
-            ))
-            return None, errors
+        if op is Op.LOAD or op is Op.LOAD_ARRAY:
+            var_name = node.name if op is Op.LOAD else f"{node.name}[]"
+            var_type = self.get_variable_type(var_name)
+            if var_type is None:
+                errors.append(TypeCheckError(
+                    message=f"Неизвестная переменная: {var_name}",
+                    tree=node,
+                    tree_str=tree_view_to_str(node)
+                ))
+            return normalize_type(var_type), errors
         
         # 3. Вызов функции: call(func_name)
-        if label.startswith('call('):
-            func_name = parse_call_name(label)
-            if func_name:
-                call_errors = self._check_call(node, func_name)
-                errors.extend(call_errors)
-                return_type = self.get_function_return_type(func_name)
-                # Примечание: возвращаем None для void функций, но проверка использования
-                # как значения будет выполнена в местах, где ожидается значение
-                return normalize_type(return_type), errors
-            errors.append(TypeCheckError(
-                message=f"Не удалось распознать вызов функции: {label}",
-                tree=node,
-                tree_str=tree_view_to_str(node)
-            ))
-            return None, errors
+        if op is Op.CALL:
+            func_name = node.name
+            call_errors = yield self._check_call(node, func_name)
+            errors.extend(call_errors)
+            return_type = self.get_function_return_type(func_name)
+            # Примечание: возвращаем None для void функций, но проверка использования
+            # как значения будет выполнена в местах, где ожидается значение
+            return normalize_type(return_type), errors
         
         # 4. Сохранение: store(name)
-        if label.startswith('store(') and not label.startswith('store_at('):
-            var_name = parse_store_name(label)
-            if var_name and node.children:
+        if op is Op.STORE:
+            var_name = node.name
+            if node.children:
                 var_type = self.get_variable_type(var_name)
                 if var_type is None:
                     errors.append(TypeCheckError(
@@ -464,10 +510,10 @@ class TypeChecker:
                 # Сначала пропагируем тип переменной к правой части
                 # Это позволяет правильно вывести типы для выражений с UNTYPED_INT
                 if var_type in NUMERIC_TYPES:
-                    self._resolve_subtree(node.children[0], var_type)
+                    yield self._resolve_subtree(node.children[0], var_type)
 
                 # Проверяем тип правой части (теперь с учётом пропагированного типа)
-                rhs_type, rhs_errors = self.infer_type(node.children[0])
+                rhs_type, rhs_errors = yield self._infer_type(node.children[0])
                 errors.extend(rhs_errors)
                 rhs_type = normalize_type(rhs_type)
 
@@ -509,9 +555,9 @@ class TypeChecker:
             return None, errors
         
         # 4.1. Сохранение в массив: store_at(name) [idx1, idx2, ..., value]
-        if label.startswith('store_at('):
-            arr_name = parse_store_at_name(label)
-            if arr_name and node.children:
+        if op is Op.STORE_AT:
+            arr_name = node.name
+            if node.children:
                 # Получаем тип массива
                 arr_type = self.get_variable_type(arr_name)
                 if arr_type is None:
@@ -547,7 +593,7 @@ class TypeChecker:
                 
                 # Проверяем типы индексов (UNTYPED_INT приводится к int)
                 for idx_node in indices:
-                    idx_type, idx_errors = self.infer_type(idx_node)
+                    idx_type, idx_errors = yield self._infer_type(idx_node)
                     errors.extend(idx_errors)
                     idx_type = normalize_type(idx_type)
                     
@@ -568,7 +614,7 @@ class TypeChecker:
                         ))
 
                 # Проверяем тип значения
-                value_type, value_errors = self.infer_type(value_node)
+                value_type, value_errors = yield self._infer_type(value_node)
                 errors.extend(value_errors)
                 value_type = normalize_type(value_type)
                 
@@ -600,7 +646,7 @@ class TypeChecker:
             return None, errors
         
         # 5. Индексация: index
-        if label == 'index':
+        if op is Op.INDEX:
             if len(node.children) != 2:
                 errors.append(TypeCheckError(
                     message=f"Некорректная индексация: ожидается 2 потомка",
@@ -611,11 +657,11 @@ class TypeChecker:
 
             base_node, index_node = node.children
 
-            base_type, base_errors = self.infer_type(base_node)
+            base_type, base_errors = yield self._infer_type(base_node)
             errors.extend(base_errors)
             base_type = normalize_type(base_type)
 
-            index_type, index_errors = self.infer_type(index_node)
+            index_type, index_errors = yield self._infer_type(index_node)
             errors.extend(index_errors)
             index_type = normalize_type(index_type)
 
@@ -650,29 +696,31 @@ class TypeChecker:
             
             return None, errors
         
+        operator = node.operator
+
         # 6. Бинарные операторы
-        if label in ARITHMETIC_OPS:
-            return self._check_binary_arithmetic(node, label, errors)
+        if operator in ARITHMETIC_OPS:
+            return (yield self._check_binary_arithmetic(node, operator, errors))
         
-        if label in BITWISE_OPS:
-            return self._check_binary_bitwise(node, label, errors)
+        if operator in BITWISE_OPS:
+            return (yield self._check_binary_bitwise(node, operator, errors))
         
-        if label in LOGICAL_OPS:
-            return self._check_binary_logical(node, label, errors)
+        if operator in LOGICAL_OPS:
+            return (yield self._check_binary_logical(node, operator, errors))
         
-        if label in COMPARISON_OPS:
-            return self._check_comparison(node, label, errors)
+        if operator in COMPARISON_OPS:
+            return (yield self._check_comparison(node, operator, errors))
         
         # 7. Унарные операторы
-        if label in UNARY_LOGICAL_OPS:
-            return self._check_unary_logical(node, label, errors)
+        if operator in UNARY_LOGICAL_OPS:
+            return (yield self._check_unary_logical(node, operator, errors))
         
-        if label in UNARY_BITWISE_OPS:
-            return self._check_unary_bitwise(node, label, errors)
+        if operator in UNARY_BITWISE_OPS:
+            return (yield self._check_unary_bitwise(node, operator, errors))
         
         # Неизвестный узел
         errors.append(TypeCheckError(
-            message=f"Неизвестный тип узла: {label}",
+            message=f"Неизвестный тип узла: {node.label}",
             tree=node,
             tree_str=tree_view_to_str(node)
         ))
@@ -691,7 +739,7 @@ class TypeChecker:
             ))
             # Всё равно проверяем типы аргументов
             for arg_node in node.children:
-                _, arg_errors = self.infer_type(arg_node)
+                _, arg_errors = yield self._infer_type(arg_node)
                 errors.extend(arg_errors)
             return errors
         
@@ -722,7 +770,7 @@ class TypeChecker:
             expected_type = normalize_type(expected_type)
 
             # Получаем тип аргумента (один раз)
-            actual_type, arg_errors = self.infer_type(actual_node)
+            actual_type, arg_errors = yield self._infer_type(actual_node)
             errors.extend(arg_errors)
             actual_type = normalize_type(actual_type)
             
@@ -764,9 +812,12 @@ class TypeChecker:
         
         Также рекурсивно пропагирует типы к дочерним узлам.
         """
+        return self._run(self._infer_and_resolve_type(node, type_hint))
+
+    def _infer_and_resolve_type(self, node: TreeViewNode, type_hint: Optional[str]):
         type_hint = normalize_type(type_hint)
         # Сначала получаем базовый тип
-        base_type, errors = self.infer_type(node)
+        base_type, errors = yield self._infer_type(node)
         base_type = normalize_type(base_type)
         
         # Определяем финальный тип
@@ -779,7 +830,7 @@ class TypeChecker:
         self.set_resolved_type(node, resolved)
         
         # Пропагируем тип к дочерним узлам
-        self._propagate_types_to_children(node, resolved)
+        yield self._propagate_types_to_children(node, resolved)
         
         return resolved, errors
     
@@ -793,94 +844,93 @@ class TypeChecker:
         if not node.children:
             return
         
-        label = node.label
+        op = node.op
         
         # Для store - пропагируем тип переменной к правой части
-        if label.startswith('store(') and not label.startswith('store_at('):
-            var_name = parse_store_name(label)
-            if var_name:
-                var_type = self.get_variable_type(var_name)
-                if var_type and node.children:
-                    self._resolve_subtree(node.children[0], var_type)
+        if op is Op.STORE:
+            var_type = self.get_variable_type(node.name)
+            if var_type and node.children:
+                yield self._resolve_subtree(node.children[0], var_type)
         
         # Для store_at - пропагируем тип элемента массива
-        elif label.startswith('store_at('):
-            arr_name = parse_store_at_name(label)
-            if arr_name:
-                arr_type = self.get_variable_type(arr_name)
-                if arr_type and is_array_type(arr_type):
-                    element_type = normalize_type(get_array_element_type(arr_type))
-                    if element_type and len(node.children) >= 2:
-                        # Индексы - int, значение - тип элемента
-                        for idx_node in node.children[:-1]:
-                            self._resolve_subtree(idx_node, 'int')
-                        self._resolve_subtree(node.children[-1], element_type)
+        elif op is Op.STORE_AT:
+            arr_type = self.get_variable_type(node.name)
+            if arr_type and is_array_type(arr_type):
+                element_type = normalize_type(get_array_element_type(arr_type))
+                if element_type and len(node.children) >= 2:
+                    # Индексы - int, значение - тип элемента
+                    for idx_node in node.children[:-1]:
+                        yield self._resolve_subtree(idx_node, 'int')
+                    yield self._resolve_subtree(node.children[-1], element_type)
         
         # Для бинарных операций - пропагируем унифицированный тип
-        elif label in ARITHMETIC_OPS | BITWISE_OPS | COMPARISON_OPS:
+        elif op is Op.BINARY and node.operator in ARITHMETIC_OPS | BITWISE_OPS | COMPARISON_OPS:
             if len(node.children) == 2:
                 left_node, right_node = node.children
                 
                 # Получаем типы операндов
-                left_type, _ = self.infer_type(left_node)
-                right_type, _ = self.infer_type(right_node)
+                left_type, _ = yield self._infer_type(left_node)
+                right_type, _ = yield self._infer_type(right_node)
                 
                 # Унифицируем
                 unified = unify_types(left_type, right_type)
                 if unified:
-                    self._resolve_subtree(left_node, unified)
-                    self._resolve_subtree(right_node, unified)
+                    yield self._resolve_subtree(left_node, unified)
+                    yield self._resolve_subtree(right_node, unified)
         
         # Для call - пропагируем типы аргументов
-        elif label.startswith('call('):
-            func_name = parse_call_name(label)
-            if func_name:
-                expected_args = self.get_function_args(func_name)
-                expected_arg_list = list(expected_args.items())
-                for i, child in enumerate(node.children):
-                    if i < len(expected_arg_list):
-                        _, (expected_type, _) = expected_arg_list[i]
-                        if expected_type:
-                            self._resolve_subtree(child, expected_type)
+        elif op is Op.CALL:
+            expected_args = self.get_function_args(node.name)
+            expected_arg_list = list(expected_args.items())
+            for i, child in enumerate(node.children):
+                if i < len(expected_arg_list):
+                    _, (expected_type, _) = expected_arg_list[i]
+                    if expected_type:
+                        yield self._resolve_subtree(child, expected_type)
         
         # Для index - индекс должен быть int
-        elif label == 'index':
+        elif op is Op.INDEX:
             if len(node.children) == 2:
                 base_node, index_node = node.children
-                self._resolve_subtree(index_node, 'int')
+                yield self._resolve_subtree(index_node, 'int')
                 # Для базы рекурсивно вызываем
-                self._propagate_types_to_children(base_node, None)
+                yield self._propagate_types_to_children(base_node, None)
         
         # Для унарных операций
-        elif label in UNARY_BITWISE_OPS:
+        elif op is Op.UNARY and node.operator in UNARY_BITWISE_OPS:
             if node.children:
                 # Унарный ~ сохраняет тип операнда
-                self._resolve_subtree(node.children[0], parent_type)
+                yield self._resolve_subtree(node.children[0], parent_type)
         
-        elif label in UNARY_LOGICAL_OPS:
+        elif op is Op.UNARY and node.operator in UNARY_LOGICAL_OPS:
             if node.children:
-                self._resolve_subtree(node.children[0], 'bool')
+                yield self._resolve_subtree(node.children[0], 'bool')
     
     def _resolve_subtree(self, node: TreeViewNode, type_hint: Optional[str]):
         """
         Рекурсивно разрешает типы в поддереве с учётом подсказки.
         """
+        return (yield self._memoized(
+            ('resolve', id(node), type_hint), node,
+            lambda: self._resolve_node(node, type_hint),
+        ))
+
+    def _resolve_node(self, node: TreeViewNode, type_hint: Optional[str]):
         type_hint = normalize_type(type_hint)
-        label = node.label
         
         # Для бинарных операций сначала пропагируем тип к операндам
         # Это важно, чтобы UNTYPED_INT литералы получили правильный тип
         if type_hint is not None and type_hint in NUMERIC_TYPES:
-            if label in ARITHMETIC_OPS | BITWISE_OPS:
+            if node.op is Op.BINARY and node.operator in ARITHMETIC_OPS | BITWISE_OPS:
                 if len(node.children) == 2:
                     # Пропагируем тип к обоим операндам
-                    self._resolve_subtree(node.children[0], type_hint)
-                    self._resolve_subtree(node.children[1], type_hint)
+                    yield self._resolve_subtree(node.children[0], type_hint)
+                    yield self._resolve_subtree(node.children[1], type_hint)
                     # Не сохраняем тип для узла операции здесь - 
                     # infer_type выведет его на основе типов операндов
                     # Но если базовый тип будет UNTYPED_INT, он будет заменён на type_hint ниже
         
-        base_type, _ = self.infer_type(node)
+        base_type, _ = yield self._infer_type(node)
         base_type = normalize_type(base_type)
         
         # Определяем финальный тип
@@ -893,7 +943,7 @@ class TypeChecker:
         self.set_resolved_type(node, resolved)
         
         # Рекурсивно обрабатываем детей
-        self._propagate_types_to_children(node, resolved)
+        yield self._propagate_types_to_children(node, resolved)
 
     def _check_binary_op(
         self,
@@ -920,11 +970,11 @@ class TypeChecker:
 
         left_node, right_node = node.children
 
-        left_type, left_errors = self.infer_type(left_node)
+        left_type, left_errors = yield self._infer_type(left_node)
         errors.extend(left_errors)
         left_type = normalize_type(left_type)
 
-        right_type, right_errors = self.infer_type(right_node)
+        right_type, right_errors = yield self._infer_type(right_node)
         errors.extend(right_errors)
         right_type = normalize_type(right_type)
 
@@ -1012,16 +1062,16 @@ class TypeChecker:
         left_node, right_node = node.children
 
         # Получаем исходные типы операндов до унификации
-        left_type_orig, left_errors = self.infer_type(left_node)
+        left_type_orig, left_errors = yield self._infer_type(left_node)
         errors.extend(left_errors)
         left_type_orig = normalize_type(left_type_orig)
 
-        right_type_orig, right_errors = self.infer_type(right_node)
+        right_type_orig, right_errors = yield self._infer_type(right_node)
         errors.extend(right_errors)
         right_type_orig = normalize_type(right_type_orig)
 
         # Вызываем _check_binary_op для проверки и унификации
-        left_type, right_type, errors = self._check_binary_op(
+        left_type, right_type, errors = yield self._check_binary_op(
             node, op, errors, ARITHMETIC_TYPES, "числовой тип"
         )
 
@@ -1054,7 +1104,7 @@ class TypeChecker:
         errors: List[TypeCheckError],
     ) -> Tuple[Optional[str], List[TypeCheckError]]:
         """Проверка битового оператора."""
-        left_type, right_type, errors = self._check_binary_op(
+        left_type, right_type, errors = yield self._check_binary_op(
             node, op, errors, BITWISE_TYPES, "целочисленный тип"
         )
 
@@ -1069,7 +1119,7 @@ class TypeChecker:
         errors: List[TypeCheckError],
     ) -> Tuple[Optional[str], List[TypeCheckError]]:
         """Проверка логического оператора."""
-        left_type, right_type, errors = self._check_binary_op(
+        left_type, right_type, errors = yield self._check_binary_op(
             node, op, errors, {'bool'}, "bool"
         )
         
@@ -1083,7 +1133,7 @@ class TypeChecker:
         errors: List[TypeCheckError],
     ) -> Tuple[Optional[str], List[TypeCheckError]]:
         """Проверка оператора сравнения."""
-        left_type, right_type, errors = self._check_binary_op(
+        left_type, right_type, errors = yield self._check_binary_op(
             node, op, errors, COMPARABLE_TYPES, "сравнимый тип"
         )
         
@@ -1105,7 +1155,7 @@ class TypeChecker:
             ))
             return None, errors
         
-        operand_type, operand_errors = self.infer_type(node.children[0])
+        operand_type, operand_errors = yield self._infer_type(node.children[0])
         errors.extend(operand_errors)
         
         # Проверяем, что операнд не является void функцией
@@ -1143,7 +1193,7 @@ class TypeChecker:
             ))
             return None, errors
         
-        operand_type, operand_errors = self.infer_type(node.children[0])
+        operand_type, operand_errors = yield self._infer_type(node.children[0])
         errors.extend(operand_errors)
         operand_type = normalize_type(operand_type)
         
@@ -1180,11 +1230,14 @@ def check_types_in_cfg(
     checker.set_context(func_name)
 
     for block_id, block in cfg.blocks.items():
-        if block.tree is not None:
+        typed_trees = []
+        for tree in block.trees:
             # Присваиваем типы узлам дерева
-            node_type, errors = checker.assign_types(block.tree)
+            node_type, errors = checker.assign_types(tree)
             result.errors.extend(errors)
-            result.typed_blocks[block_id] = [(block.tree, node_type)]
+            typed_trees.append((tree, node_type))
+        if typed_trees:
+            result.typed_blocks[block_id] = typed_trees
 
     return result
 
@@ -1194,11 +1247,14 @@ def check_all_functions(
     funcs_vars: Dict[str, Dict[str, Tuple[Optional[str], object]]],
     funcs_calls: Dict[str, Dict[str, Tuple[Optional[str], object]]],
     funcs_returns: Dict[str, Tuple[Optional[str], object]],
+    only: Optional[Set[str]] = None,
 ) -> Dict[str, TypeCheckResult]:
     """
     Проверяет типы во всех функциях и присваивает типы узлам.
 
     not_typed_data: { func_name: (references, _, cfg, tree, params, vars) }
+    only: если задано — проверяются только функции из этого множества
+          (остальные считаются уже типизированными).
 
     Возвращает: { func_name: TypeCheckResult }
     
@@ -1214,6 +1270,8 @@ def check_all_functions(
             continue
         if cfg is None:
             continue
+        if only is not None and func_name not in only:
+            continue
         
         result = check_types_in_cfg(cfg, func_name, checker)
         results[func_name] = result
@@ -1250,28 +1308,12 @@ def typed_tree_view_to_str(node: TreeViewNode) -> str:
     
     Читает типы из node.type (должны быть предварительно заполнены).
     """
-    VBAR, SPACE, TEE, ELBOW = ("│   ", "    ", "├── ", "└── ")
-
     lines: List[str] = []
-
-    def walk(n: TreeViewNode, anc_has_next: List[bool], is_last: bool) -> None:
-        # Формируем префикс
-        if not anc_has_next:
-            prefix = ""
-        else:
-            base = "".join(VBAR if has_next else SPACE for has_next in anc_has_next)
-            prefix = base + (ELBOW if is_last else TEE)
-
+    for prefix, n in iter_tree_view(node):
         # Добавляем тип из node.type
         type_str = f" : {n.type}" if n.type else ""
         lines.append(f"{prefix}{n.label}{type_str}")
 
-        # Рекурсивно обходим детей
-        child_anc = [*anc_has_next, not is_last]
-        for i, ch in enumerate(n.children):
-            walk(ch, child_anc, i == len(n.children) - 1)
-
-    walk(node, [], True)
     return "\n".join(lines)
 
 
@@ -1286,14 +1328,15 @@ def render_typed_cfg(
     Типы должны быть уже заполнены в node.type.
     """
     from graphviz import Digraph
+    from graph_parser import EdgeKind
     
     dot = Digraph(name="TypedCFG")
     dot.attr("node", shape="box")
     
     for block in cfg.blocks.values():
-        if block.tree is not None:
-            # Создаём типизированное представление дерева (читает node.type)
-            typed_label = typed_tree_view_to_str(block.tree)
+        if block.trees:
+            # Создаём типизированное представление деревьев (читает node.type)
+            typed_label = "\n".join(typed_tree_view_to_str(tree) for tree in block.trees)
             # Escape для graphviz
             lines = typed_label.splitlines()
             node_label = ""
@@ -1308,12 +1351,12 @@ def render_typed_cfg(
     
     # Добавляем рёбра
     for block in cfg.blocks.values():
-        for succ_id, edge_label in block.succs:
+        for succ_id, kind in block.succs:
             if succ_id not in cfg.blocks:
                 continue
             edge_kwargs = {}
-            if edge_label is not None:
-                edge_kwargs["label"] = edge_label
+            if kind is not EdgeKind.FALLTHROUGH:
+                edge_kwargs["label"] = kind.value
             dot.edge(str(block.id), str(succ_id), **edge_kwargs)
     
     dot.render(filename, format=fmt, cleanup=True)
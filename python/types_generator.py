@@ -26,20 +26,20 @@ def get_type_from_typeRef(type_ref_node):
     # builtin: 'int', 'bool', 'string', ...
     if kind.label == 'builtin':
         token = kind.children[0]
-        return normalize_type(token.label.strip('"')), None
+        return normalize_type(token.text), None
 
     # custom: identifier — считаем ошибкой (классы не поддерживаются)
     # custom сам является identifier (не содержит вложенный identifier)
     if kind.label == 'custom':
         token = kind.children[0]
-        type_name = token.label.strip('"')
+        type_name = token.text
         return type_name, "классы не поддерживаются"
 
     # иногда грамматика может давать сразу identifier
     if kind.label == 'identifier':
         token = kind.children[0]
         # это тоже пользовательский тип
-        type_name = token.label.strip('"')
+        type_name = token.text
         return type_name, "классы не поддерживаются"
 
     # array: 'array' '[' (',')* ']' 'of' typeRef
@@ -59,7 +59,7 @@ def get_type_from_typeRef(type_ref_node):
 
         # array of string — тоже запрещаем (string трактуем как массив символов)
         if inner_kind.label == 'builtin':
-            inner_token = inner_kind.children[0].label.strip('"').lower()
+            inner_token = inner_kind.children[0].text.lower()
             if inner_token == 'string':
                 return None, "массивы строк не поддерживаются"
 
@@ -97,7 +97,7 @@ def get_dict_var(nodes):
 
         # собираем имена идентификаторов a,b,c,...
         names = [
-            ident.children[0].label.strip('"')
+            ident.children[0].text
             for ident in node.children
             if ident.label == 'identifier'
         ]
@@ -197,7 +197,7 @@ def get_args_dict(arg_nodes):
 
         # 1. имя аргумента
         ident_node = next(c for c in arg.children if c.label == 'identifier')
-        name = ident_node.children[0].label.strip('"')
+        name = ident_node.children[0].text
 
         type_node = None
         type_str = None
@@ -254,7 +254,13 @@ def check_var_param_conflicts(funcs_vars, funcs_calls):
 
     return conflicts
 
-def process_type(not_typed_data: dict):
+def process_type(not_typed_data: dict, only: set[str] | None = None):
+    """
+    Проверка типов всех функций.
+
+    only — если задано, выражения проверяются только у функций из этого
+    множества (режим --watch), сигнатуры собираются по всем функциям.
+    """
     global_errors = {}
     funcs_returns = {}
     funcs_calls = {}
@@ -403,6 +409,7 @@ def process_type(not_typed_data: dict):
         funcs_vars,
         funcs_calls,
         funcs_returns,
+        only=only,
     )
     
     # Собираем ошибки типизации
@@ -0,0 +1,277 @@
+"""
+Режим --watch: компилятор-демон.
+
+Держит в памяти разобранные деревья файлов, CFG функций, типизированные
+данные и куски ассемблера. При изменении входных файлов пересобирает
+только изменившиеся функции и тех, кто их вызывает, и переписывает
+только те выходные файлы, содержимое которых поменялось.
+"""
+
+import time
+from pathlib import Path
+
+from file_parser_to_graph import (
+    build_function,
+    calls_to_graphviz,
+    format_errors_report,
+    merge_file_functions,
+    results_to_tuples,
+)
+from generate_asm import func_to_asm, prelude_to_asm
+from graph_parser import render_cfg
+from tree_cache import TreeCache
+from tree_parser import build_tree_view, collect_syntax_errors, dump_tree_view
+from type_checker import render_typed_cfg
+from types_generator import check_main_function, process_type
+
+
+def write_if_changed(path, text: str) -> bool:
+    """Пишет text в path, только если содержимое отличается. True — файл переписан."""
+    path = Path(path)
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return True
+
+
+def remove_if_exists(path) -> None:
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+
+
+def clear_types(cfg) -> None:
+    """Сбрасывает node.type во всех деревьях CFG перед повторной типизацией."""
+    for block in cfg.blocks.values():
+        stack = list(block.trees)
+        while stack:
+            node = stack.pop()
+            node.type = None
+            stack.extend(node.children)
+
+
+class WatchCompiler:
+    """
+    Состояние компилятора между запусками.
+
+    _files — file_path -> {"data", "view_root", "errors", "funcs"}, где funcs:
+             текст функции (bytes; у дерева из TreeCache — её узел)
+             -> словарь build_function
+    _built — func_name -> словарь build_function, принятый в прошлом раунде
+    _pending — функции, изменившиеся с последнего успешного раунда
+    _fresh — функции, у которых типы и ассемблер актуальны
+    _asm   — func_name -> код функции
+
+    tree_format — формат дампов деревьев (TREE_DUMP_FORMATS),
+    tree_cache_dir — директория TreeCache (None — без кэша деревьев).
+    """
+
+    def __init__(self, session, file_paths, out_dir, tree_format="text", tree_cache_dir=None):
+        self.session = session
+        self.file_paths = [str(p) for p in file_paths]
+        self.out_dir = Path(out_dir)
+        self.tree_format = tree_format
+        self.tree_cache = TreeCache(tree_cache_dir, session) if tree_cache_dir is not None else None
+        self._files: dict[str, dict] = {}
+        self._built: dict[str, dict] = {}
+        self._pending: set[str] = set()
+        self._fresh: set[str] = set()
+        self._asm: dict[str, str] = {}
+        self._prelude: str | None = None
+        self._call_graph_source: str | None = None
+
+    #######################################################################
+    # FRONTEND
+    #######################################################################
+
+    def _load_file(self, file_path: str) -> dict:
+        """Перечитывает файл; при неизменном содержимом возвращает кэш."""
+        with open(file_path, "rb") as f:
+            data = f.read()
+
+        state = self._files.get(file_path)
+        if state is not None and state["data"] == data:
+            return state
+
+        key = view_root = None
+        if self.tree_cache is not None:
+            key = self.tree_cache.key(data)
+            view_root = self.tree_cache.load(key)
+        if view_root is not None:
+            errors = []
+        else:
+            tree = self.session.reparse(file_path, data).tree
+            errors = collect_syntax_errors(tree.root_node)
+            if not errors:
+                view_root, _ = build_tree_view(tree.root_node)
+                if key is not None:
+                    self.tree_cache.store(key, view_root)
+        if view_root is not None:
+            dump_tree_view(view_root, self.out_dir / "tree" / Path(file_path).stem, self.tree_format)
+
+        state = {
+            "data": data,
+            "view_root": view_root,
+            "errors": errors,
+            "funcs": state["funcs"] if state is not None else {},
+        }
+        self._files[file_path] = state
+        return state
+
+    def _analyze(self):
+        """
+        Аналог analyze_files, но CFG берутся из кэша по тексту функции.
+        Возвращает (result, accepted), accepted — func_name -> built.
+        """
+        results_internal = {}
+        declared = {}
+        accepted: dict[str, dict] = {}
+        (self.out_dir / "graph").mkdir(parents=True, exist_ok=True)
+
+        for file_path in self.file_paths:
+            state = self._load_file(file_path)
+            cache = state["funcs"]
+            used: dict = {}
+
+            def build(func_name, node, file_path=file_path, cache=cache, used=used):
+                # У дерева из TreeCache нет текста функций: ключом служит сам
+                # узел, он живёт, пока файл не изменился
+                key = getattr(node.node, "text", None) or node
+                built = cache.get(key)
+                if built is None:
+                    built = build_function(node, func_name, file_path)
+                    if built["cfg"] is not None:
+                        render_cfg(
+                            built["cfg"],
+                            filename=str(self.out_dir / "graph" / f"{Path(file_path).stem}_{func_name}"),
+                            fmt="svg",
+                        )
+                used[key] = built
+                accepted[func_name] = built
+                return built
+
+            merge_file_functions(
+                results_internal, declared, file_path,
+                state["view_root"], state["errors"], build=build,
+            )
+            state["funcs"] = used
+
+        return results_to_tuples(results_internal), accepted
+
+    #######################################################################
+    # ROUND
+    #######################################################################
+
+    def run_once(self) -> bool:
+        """
+        Один раунд компиляции. Возвращает True, если result.asm актуален.
+        """
+        result, accepted = self._analyze()
+
+        self._pending |= {
+            name for name in accepted.keys() | self._built.keys()
+            if accepted.get(name) is not self._built.get(name)
+        }
+        self._built = accepted
+        changed = self._pending
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        call_graph_base = self.out_dir / "call_graph"
+        dot = calls_to_graphviz(result)
+        if dot.source != self._call_graph_source:
+            dot.render(str(call_graph_base), format="svg", cleanup=True)
+            self._call_graph_source = dot.source
+
+        errors_report_path = call_graph_base.with_suffix(".errors.txt")
+        lines = format_errors_report(result)
+        if lines:
+            write_if_changed(errors_report_path, "\n".join(lines))
+            print(f"Ошибки записаны в {errors_report_path}")
+            return False
+        remove_if_exists(errors_report_path)
+
+        # Затронутые функции: изменившиеся, их вызывающие и всё, что не
+        # удалось собрать в прошлый раз
+        callers = {
+            name for name, (calls, *_rest) in result.items()
+            if calls & changed
+        }
+        defined = {
+            name for name, (_calls, _errors, cfg, *_rest) in result.items()
+            if cfg is not None and not name.startswith("<file:")
+        }
+        affected = defined - (self._fresh - changed - callers)
+
+        for name in affected:
+            clear_types(result[name][2])
+
+        typed_data, type_errors, funcs_returns = process_type(result, only=affected)
+        type_errors_path = self.out_dir / "type_errors.txt"
+        if type_errors:
+            write_if_changed(type_errors_path, "".join(
+                f"=== {func_name} ===\n" + "".join(f"{err}\n" for err in err_list) + "\n"
+                for func_name, err_list in type_errors.items()
+            ))
+            print(f"Ошибки типизации записаны в {type_errors_path}")
+            return False
+        remove_if_exists(type_errors_path)
+
+        typed_graph_dir = self.out_dir / "typed_graph"
+        typed_graph_dir.mkdir(parents=True, exist_ok=True)
+        for name in sorted(affected):
+            safe_name = name.replace('"', '').replace('<', '').replace('>', '')
+            render_typed_cfg(typed_data[name][2], str(typed_graph_dir / safe_name), "svg")
+
+        if not check_main_function(result, errors_report_path):
+            return False
+
+        if self._prelude is None:
+            self._prelude = prelude_to_asm()
+        parts = [self._prelude]
+        for name, (_, _, cfg, tree, params, vars) in typed_data.items():
+            if name.startswith("<file:") or cfg is None:
+                continue
+            if name in affected or name not in self._asm:
+                self._asm[name] = func_to_asm(name, cfg, tree, params, vars, funcs_returns)
+            parts.append(self._asm[name])
+        for name in set(self._asm) - defined:
+            del self._asm[name]
+
+        asm_file = self.out_dir / "result.asm"
+        if write_if_changed(asm_file, "".join(parts)):
+            print(f"Ассемблерный код сохранен в {asm_file}")
+        self._fresh = defined
+        self._pending = set()
+        print(f"Пересобрано функций: {len(affected)} из {len(defined)}")
+        return True
+
+    def _stamps(self):
+        stamps = {}
+        for file_path in self.file_paths:
+            try:
+                st = Path(file_path).stat()
+                stamps[file_path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stamps[file_path] = None
+        return stamps
+
+    def watch(self, interval: float = 0.5) -> None:
+        """Компилирует и затем опрашивает файлы, пока не прервут (Ctrl+C)."""
+        last = None
+        try:
+            while True:
+                stamps = self._stamps()
+                if stamps != last:
+                    last = stamps
+                    missing = [p for p, st in stamps.items() if st is None]
+                    if missing:
+                        print(f"Файлы не найдены: {', '.join(missing)}")
+                    else:
+                        self.run_once()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Наблюдение остановлено")